@@ -17,11 +17,12 @@ import concur.extra_widgets
 import concur.integrations
 import concur.draw
 import concur.testing
+import concur.profiler
 
 from .core import *
 from .widgets import *
 from .extra_widgets import *
-from .integrations import main, quick_plot, quick_window, quick_image
+from .integrations import main, main_async, quick_plot, quick_window, quick_image
 
 import functools
 
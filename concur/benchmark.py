@@ -0,0 +1,323 @@
+""" Frame-time benchmarks of widgets, and comparison of their results against a baseline.
+
+A benchmark runs a widget for a number of frames after a warmup, and measures each frame split into three phases:
+
+* `logic`: input processing, `imgui.new_frame`, and resuming the widget,
+* `render`: `imgui.render`, which finalizes the ImGui draw data,
+* `submit`: drawing the draw data using OpenGL, waiting for the GPU to finish. This is zero with the
+  `concur.integrations.null` back-end.
+
+The mean and maximum of the per-frame counters of `concur.profiler.draw_stats` are recorded as well, so that
+the geometry of overlays can be compared, and budgeted in tests.
+
+```python
+def app(renderer):
+    while True:
+        yield from c.frame("Frame", view, content_gen=markers)
+        yield
+
+result = c.benchmark.run(app, frames=600, warmup=60)
+print(c.benchmark.format_result(result))
+c.benchmark.save({"markers": result}, "bench.json")
+```
+
+Saved results are compared against a baseline from the command line. The command exits with status 1
+if any benchmark is slower than the baseline by more than the threshold:
+
+```bash
+python -m concur.benchmark compare baseline.json bench.json --threshold 0.1 --stat p95
+```
+
+The files may also be written by pytest-benchmark, from tests using `concur.testing.benchmark_widget`
+or `concur.testing.benchmark_scenario`:
+
+```bash
+pytest tests/test_examples.py -k perf --benchmark-json=bench.json
+```
+
+The overhead of the widget model itself is measured by `core_suite`, which runs the combinators of `concur.core`
+at increasing fan-out and nesting depth, without ImGui. Its results are in the same format:
+
+```bash
+python -m concur.benchmark core --output core.json
+```
+"""
+
+
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+import numpy as np
+
+import concur.profiler as _profiler
+
+
+PHASES = _profiler.PHASES
+STATS = ["mean", "p50", "p95", "p99", "max"]
+
+
+def run(widget_gen, frames=240, warmup=30, backend="null", width=512, height=512):
+    """ Benchmark a widget.
+
+    Args:
+        widget_gen: Function taking the renderer of the back-end, and returning the benchmarked widget.
+            This is the same as for `concur.integrations.puppet.main`. The benchmark stops early if the widget returns.
+        frames: Number of measured frames.
+        warmup: Number of frames before the measurement, so that caches, textures, and ImGui state settle.
+        backend: `"null"` for `concur.integrations.null`, which measures only the CPU time, or `"puppet"` for
+            `concur.integrations.puppet`, which renders into a hidden window.
+        width: Window width.
+        height: Window height.
+
+    Returns:
+        JSON-serializable dict with the benchmark settings, the number of measured `frames`, statistics
+        of the frame times in milliseconds for each phase and for the `total`, as returned by `summarize`,
+        and the mean and maximum of each draw counter under `draw`, as returned by `summarize_draw`.
+    """
+    def bench(renderer):
+        widget = widget_gen(renderer)
+        for _ in range(warmup + frames):
+            try:
+                next(widget)
+            except StopIteration:
+                return
+            yield
+
+    recorder = _profiler.PhaseRecorder()
+    _profiler._phase_recorder = recorder
+    try:
+        if backend == "null":
+            from concur.integrations.null import main
+            main(bench, width, height)
+        elif backend == "puppet":
+            from concur.integrations.puppet import main
+            main(bench, "Benchmark", width, height, headless=True, fps=None)
+        else:
+            raise ValueError(f"Unknown back-end: {backend}")
+    finally:
+        _profiler._phase_recorder = None
+    # The last frame is the one in which the benchmark widget returned
+    result = summarize(np.array(recorder.frames[:-1][warmup:]).reshape(-1, len(PHASES)))
+    result.update(backend=backend, warmup=warmup, width=width, height=height,
+                  draw=summarize_draw(recorder.draw[:-1][warmup:]))
+    return result
+
+
+def summarize(times):
+    """ Statistics of phase durations with shape `(frames, phases)` in seconds. The statistics are in milliseconds. """
+    def stats(t):
+        if len(t) == 0:
+            return {stat: None for stat in STATS}
+        t = t * 1000
+        return dict(mean=float(np.mean(t)), p50=float(np.percentile(t, 50)), p95=float(np.percentile(t, 95)),
+                    p99=float(np.percentile(t, 99)), max=float(np.max(t)))
+    result = dict(frames=len(times), total=stats(times.sum(1)))
+    for i, phase in enumerate(PHASES):
+        result[phase] = stats(times[:, i])
+    return result
+
+
+def summarize_draw(draw_stats):
+    """ Mean and maximum of each counter in a list of `concur.profiler.draw_stats` of individual frames. """
+    result = {}
+    for counter in _profiler.DRAW_STATS:
+        counts = np.array([stats[counter] for stats in draw_stats])
+        result[counter] = dict(mean=float(np.mean(counts)), max=int(np.max(counts))) if len(counts) else \
+            dict(mean=None, max=None)
+    return result
+
+
+def format_result(result):
+    """ Format a result of `run` as a table. """
+    lines = [f"{'ms':<8}" + "".join(f"{stat:>9}" for stat in STATS)]
+    for phase in ["total"] + PHASES:
+        lines.append(f"{phase:<8}" + "".join(
+            f"{result[phase][stat]:9.3f}" if result[phase][stat] is not None else f"{'-':>9}" for stat in STATS))
+    if "draw" in result:
+        lines.append("")
+        lines.append(f"{'count':<16}{'mean':>11}{'max':>9}")
+        for counter, stats in result["draw"].items():
+            if stats["mean"] is not None:
+                lines.append(f"{counter:<16}{stats['mean']:11.1f}{stats['max']:9d}")
+    return "\n".join(lines)
+
+
+class _IdStack(object):
+    """ Stand-in for the ImGui ID stack, used by `core_suite`. IDs are hashed when pushed, as ImGui does. """
+    def __init__(self):
+        self.stack = [0]
+
+    def push_id(self, str_id):
+        self.stack.append(hash((self.stack[-1], str_id)))
+
+    def pop_id(self):
+        self.stack.pop()
+
+
+@contextlib.contextmanager
+def _stand_in_id_stack():
+    import concur.core as core
+    saved = core.push_id, core.pop_id
+    stack = _IdStack()
+    core.push_id, core.pop_id = stack.push_id, stack.pop_id
+    try:
+        yield stack
+    finally:
+        core.push_id, core.pop_id = saved
+
+
+def _idle():
+    while True:
+        yield
+
+
+def _nested_orr(depth):
+    from concur.core import orr
+    return _idle() if depth == 0 else orr([_nested_orr(depth - 1)])
+
+
+def _event_chain(depth):
+    """ Event passing through `depth` alternating `tag` and `map` combinators. """
+    from concur.core import event, tag, map
+    widget = event(0)
+    for i in range(depth):
+        widget = tag("tag", widget) if i % 2 == 0 else map(lambda v: v[1], widget)
+    return widget
+
+
+def _rebuilt(widget_gen):
+    """ App which re-creates the widget after each event, as Concur apps do. """
+    while True:
+        yield from widget_gen()
+        yield
+
+
+def _core_cases():
+    from concur.core import orr, multi_orr, stateful, event
+    cases = {}
+    for n in [10, 100, 1000, 10000, 100000]:
+        cases[f"orr/fan-out/{n}"] = n, lambda n=n: orr([_idle() for _ in range(n)])
+        cases[f"multi_orr/fan-out/{n}"] = n, lambda n=n: multi_orr([_idle() for _ in range(n)])
+        cases[f"orr/rebuild/{n}"] = n, lambda n=n: _rebuilt(lambda: orr([event(None)] + [_idle() for _ in range(n - 1)]))
+    for depth in [1, 5, 10, 50]:
+        cases[f"orr/depth/{depth}"] = depth, lambda depth=depth: _nested_orr(depth)
+        cases[f"tag_map/depth/{depth}"] = depth, lambda depth=depth: _rebuilt(lambda: _event_chain(depth))
+    cases["stateful"] = 1, lambda: stateful(lambda s: event(s + 1), 0)
+    return cases
+
+
+def core_suite(frames=100, warmup=5, filter=None):
+    """ Benchmark the combinators of `concur.core` with a stand-in for the ImGui ID stack, without ImGui.
+
+    The cases measure steady-state frames of `orr` and `multi_orr` with 10 to 100k children, re-creating
+    `orr` after each event, nested `orr` up to the depth of 50, events passing through chains of `tag` and `map`,
+    and `stateful`. Cases with large fan-out run fewer frames, so that the suite finishes quickly.
+
+    Args:
+        frames: Maximum number of measured frames per case.
+        warmup: Number of frames before the measurement.
+        filter: Run only the cases whose name contains this string.
+
+    Returns:
+        Dict mapping case names to results in the format of `run`, with all the time in the `logic` phase.
+    """
+    results = {}
+    with _stand_in_id_stack():
+        for name, (size, widget_gen) in _core_cases().items():
+            if filter is not None and filter not in name:
+                continue
+            n_frames = max(5, min(frames, 1000000 // size))
+            widget = widget_gen()
+            times = np.zeros((n_frames, len(PHASES)))
+            for i in range(warmup + n_frames):
+                t0 = time.perf_counter()
+                next(widget)
+                if i >= warmup:
+                    times[i - warmup, 0] = time.perf_counter() - t0
+            result = summarize(times)
+            result.update(backend="stand-in", warmup=warmup)
+            results[name] = result
+    return results
+
+
+def save(results, filename):
+    """ Save a dict mapping benchmark names to results of `run` as JSON. """
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load(filename):
+    """ Load results saved by `save`, or by pytest-benchmark with `--benchmark-json`.
+
+    From pytest-benchmark files, the results stored in the `extra_info` of the tests by
+    `concur.testing.benchmark_widget` and `concur.testing.benchmark_scenario` are loaded,
+    keyed by the test names. Other tests are skipped.
+    """
+    with open(filename) as f:
+        results = json.load(f)
+    if isinstance(results.get("benchmarks"), list):
+        results = {bench["name"]: bench["extra_info"] for bench in results["benchmarks"]
+                   if "total" in bench.get("extra_info", {})}
+    return results
+
+
+def compare(baseline, current, threshold=0.1, stat="p50"):
+    """ Compare results of the benchmarks present both in `baseline` and in `current`.
+
+    Returns:
+        List of `(name, phase, baseline time, current time, regressed)` tuples, where `regressed` is `True` if
+        the current time of the total or of a phase is longer than the baseline by more than the `threshold`
+        fraction. Phases which take less than 0.01 ms in the baseline are not considered to regress.
+    """
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        for phase in ["total"] + PHASES:
+            base, cur = baseline[name][phase][stat], current[name][phase][stat]
+            if base is None or cur is None:
+                continue
+            regressed = base >= 0.01 and cur > base * (1 + threshold)
+            rows.append((name, phase, base, cur, regressed))
+    return rows
+
+
+def format_comparison(rows):
+    """ Format the result of `compare` as a table. """
+    lines = [f"{'benchmark':<30} {'phase':<8} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for name, phase, base, cur, regressed in rows:
+        change = f"{(cur / base - 1) * 100:+7.1f}%" if base > 0 else f"{'-':>8}"
+        lines.append(f"{name:<30} {phase:<8} {base:10.3f} {cur:10.3f} {change}" + ("  REGRESSION" if regressed else ""))
+    return "\n".join(lines)
+
+
+def _main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m concur.benchmark", description=__doc__.split("\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare_parser = subparsers.add_parser("compare", help="Compare benchmark results against a baseline.")
+    compare_parser.add_argument("baseline", help="JSON file with the baseline results.")
+    compare_parser.add_argument("current", help="JSON file with the current results.")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown as a fraction.")
+    compare_parser.add_argument("--stat", default="p50", choices=STATS, help="Compared statistic.")
+    core_parser = subparsers.add_parser("core", help="Run the benchmarks of the core combinators.")
+    core_parser.add_argument("--output", help="JSON file to save the results into.")
+    core_parser.add_argument("--frames", type=int, default=100, help="Maximum number of frames per case.")
+    core_parser.add_argument("--filter", help="Run only the cases whose name contains this string.")
+    args = parser.parse_args(argv)
+
+    if args.command == "core":
+        results = core_suite(args.frames, filter=args.filter)
+        for name, result in results.items():
+            print(f"{name:<24} p50 {result['total']['p50']:9.4f} ms  p99 {result['total']['p99']:9.4f} ms")
+        if args.output:
+            save(results, args.output)
+        return 0
+
+    rows = compare(load(args.baseline), load(args.current), args.threshold, args.stat)
+    print(format_comparison(rows))
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
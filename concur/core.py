@@ -6,10 +6,20 @@ All of the functions in this module are re-exported in the root module for conve
 __pdoc__ = dict(remote_widget=False, fork_action=False, RemoteAction=False)
 
 
+import asyncio
+import functools
+import hashlib
+import os
 import queue
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from collections import OrderedDict
 from typing import Generator, Any, Iterable, List, Callable, Tuple
 from asyncio import Future
 from imgui import push_id, pop_id
+import concur.profiler as _profiler
 
 
 Widget = Any  # It isn't possible to type Widget correctly using mypy. Prove me wrong.
@@ -32,10 +42,14 @@ def orr(widgets: Iterable[Widget]) -> Widget:
     stop = False
     value = None
     while True:
+        prof = _profiler._current
         for i, elem in enumerate(widgets):
             try:
                 push_id(str(i))
-                next(elem)
+                if prof is None:
+                    next(elem)
+                else:
+                    prof.resume(str(i), elem)
             except StopIteration as e:
                 if not stop:
                     stop = True
@@ -77,10 +91,14 @@ def multi_orr(widgets: Iterable[Widget]) -> Widget:
     """
     events: List = []
     while events == []:
+        prof = _profiler._current
         for i, elem in enumerate(widgets):
             try:
                 push_id(str(i))
-                next(elem)
+                if prof is None:
+                    next(elem)
+                else:
+                    prof.resume(str(i), elem)
             except StopIteration as e:
                 events.append(e.value)
             finally:
@@ -173,6 +191,184 @@ def tag_value(tag_name: Any, elem: Widget) -> Widget:
     return t, (tag_name, v)
 
 
+def _same_args(a, b):
+    """ Compare argument tuples, treating values which can't be compared to a bool, such as arrays, by identity. """
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x is y:
+            continue
+        try:
+            if type(x) is not type(y) or not bool(x == y):
+                return False
+        except (ValueError, TypeError):
+            return False
+    return True
+
+
+class _KeyedChild(object):
+    def __init__(self, args, widget):
+        self.args = args
+        self.widget = widget
+        self.finished = False
+
+
+class Keyed(object):
+    """ Keeps child widgets alive across rebuilds of a list, reusing those whose key and arguments are unchanged.
+
+    Normally, all the child generators are re-created whenever the list is rebuilt after an event, losing
+    their progress. A `Keyed` object is created once, outside of the event loop, and called with the
+    children described as `(key, widget_gen, args)` tuples instead of widgets:
+
+    ```python
+    rows = c.Keyed(tag_value=True)
+    while True:
+        tag, value = yield from c.orr(rows((id, item, (text, active)) for id, (text, active) in todos.items()))
+        ...
+    ```
+
+    The returned widgets reuse the live generators of the previous call for the same key, if `widget_gen`
+    and `args` compare equal. Other children are created by `widget_gen(*args)`, and the generators of keys
+    which are no longer present are dropped. A child which has returned an event is always re-created.
+    """
+    def __init__(self, tag_value=False):
+        """
+        Args:
+            tag_value: If `True`, events `(t, v)` of each child are transformed into `(t, (key, v))`, like
+                `concur.core.tag_value` does.
+        """
+        self.tag_value = tag_value
+        self.children = {}
+
+    def __call__(self, children: Iterable[Tuple[Any, Callable[..., Widget], tuple]]) -> List[Widget]:
+        old, self.children = self.children, {}
+        widgets = []
+        for key, widget_gen, args in children:
+            args = (widget_gen,) + tuple(args)
+            child = old.pop(key, None)
+            if child is None or child.finished or not _same_args(child.args, args):
+                child = _KeyedChild(args, widget_gen(*args[1:]))
+            self.children[key] = child
+            widgets.append(self._resume(key, child))
+        return widgets
+
+    def _resume(self, key, child):
+        # `yield from` would close the child when this wrapper is dropped, so it is resumed manually
+        while True:
+            try:
+                next(child.widget)
+            except StopIteration as e:
+                value = e.value
+                break
+            yield
+        child.finished = True
+        if self.tag_value:
+            t, v = value
+            return t, (key, v)
+        return value
+
+
+def _memo_key(obj, by_content, refs):
+    """ Hashable key of an argument. Arrays are keyed by a hash of their content, or by identity.
+
+    Objects keyed by identity are appended to `refs`, which must be kept alive with the key,
+    so that their ids can't be re-used by other objects.
+    """
+    if isinstance(obj, np.ndarray):
+        if by_content and obj.dtype != object:
+            digest = hashlib.blake2b(np.ascontiguousarray(obj).view(np.uint8), digest_size=16).digest()
+            return 'array', obj.dtype.str, obj.shape, digest
+        refs.append(obj)
+        return 'id', id(obj)
+    if isinstance(obj, (list, tuple)):
+        return type(obj).__name__, tuple(_memo_key(x, by_content, refs) for x in obj)
+    if isinstance(obj, dict):
+        return 'dict', tuple((k, _memo_key(v, by_content, refs)) for k, v in obj.items())
+    try:
+        hash(obj)
+        return obj
+    except TypeError:
+        refs.append(obj)
+        return 'id', id(obj)
+
+
+def _nbytes(obj, depth=3):
+    """ Estimate the memory used by NumPy arrays in an object, its attributes, and containers. """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if depth == 0:
+        return 0
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(x, depth - 1) for x in obj)
+    if isinstance(obj, dict):
+        return sum(_nbytes(x, depth - 1) for x in obj.values())
+    if hasattr(obj, '__dict__'):
+        return sum(_nbytes(x, depth - 1) for x in vars(obj).values())
+    return 0
+
+
+def memoize(maxsize=128, max_bytes=256 << 20, by_content=True):
+    """ Decorator which caches the results of a function in a LRU cache.
+
+    It is meant for functions which prepare geometry or state of widgets, so that re-creating
+    a widget with unchanged arguments doesn't repeat the preparation. The batched `concur.draw` functions,
+    such as `concur.draw.scatter`, use it. The result is shared by all the calls with equal arguments,
+    so it must not be modified by its users.
+
+    ```python
+    @c.memoize(maxsize=16)
+    def prepare(points):
+        return expensive_preprocessing(points)
+
+    def overlay(points, tf):
+        return c.draw.polylines(prepare(points), 'red', tf=tf)
+    ```
+
+    Args:
+        maxsize: Maximum number of cached results.
+        max_bytes: Maximum memory used by NumPy arrays in the cached results. They are measured on each access,
+            so results which grow, such as objects caching geometry, are accounted for.
+        by_content: If `True`, array arguments are keyed by a hash of their content. This costs a pass over
+            the data, but arrays modified in place are handled correctly. If `False`, arrays are keyed by identity,
+            which is constant-time, but an array must not be modified after it has been passed to the function.
+            Unhashable arguments other than arrays, lists, tuples, and dicts are always keyed by identity.
+            Arguments keyed by identity are kept alive by the cache.
+
+    The decorated function has a `cache_clear` method.
+    """
+    def decorator(fn):
+        cache = OrderedDict()  # key -> [result, size, arguments keyed by identity]
+        total = 0
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal total
+            refs = []
+            key = _memo_key((args, tuple(sorted(kwargs.items()))), by_content, refs)
+            entry = cache.get(key)
+            if entry is None:
+                entry = [fn(*args, **kwargs), 0, refs or None]
+                cache[key] = entry
+            else:
+                cache.move_to_end(key)
+            size = _nbytes(entry[0])
+            total += size - entry[1]
+            entry[1] = size
+            while len(cache) > 1 and (len(cache) > maxsize or total > max_bytes):
+                _, old = cache.popitem(last=False)
+                total -= old[1]
+            return entry[0]
+
+        def cache_clear():
+            nonlocal total
+            cache.clear()
+            total = 0
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+
 def map(f: Any, elem: Widget) -> Widget:
     """ Transform any returned value `v` of `elem` into `f(v)`. """
     v = yield from elem
@@ -210,6 +406,37 @@ def stateful(elem: Callable[[Any], Widget], initial_state: Any) -> Widget:
         yield
 
 
+# Set by the idle main loop to a thread-safe function which wakes it up
+_wake_handler = None
+_redraw_requested = threading.Event()
+
+
+def invalidate():
+    """ Request a redraw, waking up the main loop if it is idle. This function is thread-safe.
+
+    It is only needed in the idle mode of `concur.integrations.glfw.main`, which draws frames only
+    in response to user input. `Block` and `Queue` call it automatically when their result is ready.
+    Widgets which animate should call it in each frame.
+    """
+    _redraw_requested.set()
+    if _wake_handler is not None:
+        _wake_handler()
+
+
+def _invalidate_on_done(future):
+    invalidate()
+
+
+class Queue(queue.Queue):
+    """ A `queue.Queue` which calls `invalidate` when an item is put in.
+
+    Use it with `listen` to wake up an idle main loop when a message arrives from another thread.
+    """
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        invalidate()
+
+
 class Block(object):
     """ Create a widget that returns on [Future](https://docs.python.org/3.9/library/asyncio-future.html#asyncio.Future) result.
 
@@ -222,6 +449,7 @@ class Block(object):
     """
     def __init__(self, future):
         self.future = future
+        self.future.add_done_callback(_invalidate_on_done)
 
     def __iter__(self):
         return self
@@ -234,8 +462,426 @@ class Block(object):
         self.future.cancel()
 
 
+# Arrays smaller than this are pickled as usual by `ProcessBlock`
+_SHARE_MIN_BYTES = 1 << 16
+
+
+def _untrack(shm):
+    """ Stop tracking a shared memory block opened in a worker, so that it isn't unlinked when the worker exits.
+
+    Workers may have their own resource tracker, and the block is owned by the main process.
+    """
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+
+class _SharedArray(object):
+    """ Pickleable reference to an array in shared memory. """
+    def __init__(self, arr):
+        self.shape, self.dtype = arr.shape, arr.dtype
+        shm = SharedMemory(create=True, size=max(1, arr.nbytes))
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+        self.name = shm.name
+        _untrack(shm)
+        shm.close()
+
+    def attach(self):
+        """ Map the array into this process, and unlink the shared memory. """
+        shm = SharedMemory(self.name)
+        shm.unlink()  # The memory is freed when the array is garbage collected
+        holder = _SharedArrayHolder(self.shape, self.dtype, buffer=shm.buf)
+        holder.shm = shm
+        return holder.view(np.ndarray)
+
+    def release(self):
+        """ Unlink the shared memory without mapping it. """
+        shm = SharedMemory(self.name)
+        shm.close()
+        shm.unlink()
+
+
+class _SharedArrayHolder(np.ndarray):
+    """ Array which keeps its `SharedMemory` open. """
+    pass
+
+
+def _map_shared(f, obj):
+    """ Apply `f` to the `_SharedArray` instances in nested tuples, lists, and dicts. """
+    if isinstance(obj, _SharedArray):
+        return f(obj)
+    elif isinstance(obj, (tuple, list)):
+        return type(obj)(_map_shared(f, x) for x in obj)
+    elif isinstance(obj, dict):
+        return {k: _map_shared(f, v) for k, v in obj.items()}
+    else:
+        return obj
+
+
+def _share(obj):
+    if isinstance(obj, np.ndarray) and obj.nbytes >= _SHARE_MIN_BYTES and not obj.dtype.hasobject:
+        return _SharedArray(obj)
+    elif isinstance(obj, (tuple, list)):
+        return type(obj)(_share(x) for x in obj)
+    elif isinstance(obj, dict):
+        return {k: _share(v) for k, v in obj.items()}
+    else:
+        return obj
+
+
+def _run_shared(fn, args, kwargs, cancel_flag):
+    """ Run `fn` in a worker process, returning large arrays in shared memory. """
+    if cancel_flag is not None:
+        flag = SharedMemory(cancel_flag)
+        _untrack(flag)
+        kwargs = dict(kwargs, cancelled=lambda: flag.buf[0] != 0)
+    try:
+        return _share(fn(*args, **kwargs))
+    finally:
+        if cancel_flag is not None:
+            flag.close()
+
+
+class ProcessBlock(object):
+    """ Create a widget that runs `fn(*args, **kwargs)` in a process pool, and returns its result.
+
+    This is an alternative to `Block` for CPU-heavy Python code, which would hold the GIL.
+    Large NumPy arrays in the result (also nested in tuples, lists, and dicts) are returned through
+    shared memory instead of being pickled.
+
+    If the widget is dropped, the job is canceled if it hasn't started yet. Functions which take a long time
+    may support cooperative cancellation: if `cancellable` is set, `fn` gets a `cancelled` keyword argument,
+    which is a function that returns `True` once the widget has been dropped.
+
+    ```python
+    executor = ProcessPoolExecutor()
+    ...
+    result = yield from c.orr([c.text("Computing..."), c.ProcessBlock(executor, compute, x)])
+    ```
+
+    `fn` and its arguments must be pickleable, so `fn` should be a module-level function.
+    """
+    def __init__(self, executor, fn, *args, cancellable=False, **kwargs):
+        # Set before anything can fail, so that `__del__` works on partially initialized objects
+        self.flag, self.future, self.returned = None, None, False
+        self.flag = SharedMemory(create=True, size=1) if cancellable else None
+        if self.flag is not None:
+            self.flag.buf[0] = 0
+        self.future = executor.submit(_run_shared, fn, args, kwargs, self.flag and self.flag.name)
+        self.future.add_done_callback(_invalidate_on_done)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.future.done():
+            self._release_flag()
+            self.returned = True
+            raise StopIteration(_map_shared(_SharedArray.attach, self.future.result()))
+
+    def _release_flag(self):
+        if self.flag is not None:
+            self.flag.close()
+            self.flag.unlink()
+            self.flag = None
+
+    def __del__(self):
+        if self.returned:
+            return
+        if self.future is None:
+            self._release_flag()
+            return
+        if self.flag is not None:
+            self.flag.buf[0] = 1
+        if not self.future.cancel():
+            # The result of a running job still needs to be released after it finishes
+            flag, self.flag = self.flag, None
+            self.future.add_done_callback(lambda future: _release_dropped(future, flag))
+        else:
+            self._release_flag()
+
+
+def _release_dropped(future, flag):
+    if flag is not None:
+        flag.close()
+        flag.unlink()
+    if not future.cancelled() and future.exception() is None:
+        _map_shared(_SharedArray.release, future.result())
+
+
+class Computation(object):
+    """ State of the `computation` widget, which runs an expensive function only for the latest input.
+
+    Inputs are submitted by `request`. At most one job runs at a time. If inputs are requested while a job
+    is running, only the latest one is computed after it finishes, and the others are dropped. The most recent
+    result is available as the `result` attribute, even while the next job is pending.
+
+    ```python
+    comp = c.Computation(executor, expensive_fn, debounce=0.1)
+
+    def app():
+        x = 0
+        while True:
+            key, value = yield from c.orr([
+                c.slider_float("x", x, 0, 1),
+                c.computation("Result", comp),
+                c.text(f"Result: {comp.result}, pending: {comp.pending}"),
+            ])
+            if key == "x":
+                x = value
+                comp.request(x)
+            yield
+    ```
+    """
+    def __init__(self, executor, fn, debounce=0.):
+        """
+        Args:
+            executor: `concurrent.futures.Executor` which runs `fn`.
+            fn: Function of one argument, the input.
+            debounce: Time in seconds for which the input must stay unchanged before its job starts.
+                This avoids starting jobs for intermediate inputs, such as while dragging a slider.
+        """
+        self.executor = executor
+        self.fn = fn
+        self.debounce = debounce
+        self.requested = None  # `(input, time of the request)` of the job which is waiting to start
+        self.future = None
+        self.future_input = None
+        self.result = None
+        self.result_input = None
+
+    @property
+    def pending(self):
+        """ `True` if there is a job running or waiting to start. """
+        return self.requested is not None or self.future is not None
+
+    def request(self, value):
+        """ Request computing `fn(value)`, superseding any request which hasn't started yet. """
+        self.requested = value, time.perf_counter()
+        if self.future is not None and self.future.cancel():
+            self.future = None
+        invalidate()
+
+    def poll(self):
+        """ Start the latest requested job if possible, and return `True` if a new result is available.
+
+        This is called by the `computation` widget in each frame.
+        """
+        new_result = False
+        if self.future is not None and self.future.done():
+            future, self.future = self.future, None
+            self.result, self.result_input = future.result(), self.future_input
+            new_result = True
+        if self.requested is not None and self.future is None:
+            value, t = self.requested
+            if time.perf_counter() - t >= self.debounce:
+                self.requested = None
+                self.future, self.future_input = self.executor.submit(self.fn, value), value
+                self.future.add_done_callback(_invalidate_on_done)
+            else:
+                invalidate()  # Keep an idle main loop running until the job starts
+        return new_result
+
+    def __del__(self):
+        if self.future is not None:
+            self.future.cancel()
+
+
+def computation(name, state):
+    """ Widget which drives a `Computation`, and returns `(name, result)` whenever a job finishes. """
+    while True:
+        if state.poll():
+            return name, state.result
+        yield
+
+
+class _StreamChannel(object):
+    """ Hand-off slot between the worker of a `Stream` and the UI thread.
+
+    It is separate from `Stream`, so that the worker doesn't keep the `Stream` alive.
+    """
+    def __init__(self, interval, backpressure):
+        self.interval = interval
+        self.backpressure = backpressure
+        self.cond = threading.Condition()
+        self.slot = None  # `(item, count)` which wasn't taken by the UI yet
+        self.pending = None  # Newest item held back by the rate limit, handed off when the interval elapses
+        self.last = -float('inf')
+        self.finished = False
+        self.error = None
+        self.cancelled = False
+
+    def run(self, source):
+        try:
+            if hasattr(source, '__anext__'):
+                asyncio.run(self.consume_async(source))
+            else:
+                try:
+                    for count, item in enumerate(source, 1):
+                        if not self.hand_off(item, count):
+                            break
+                finally:
+                    if hasattr(source, 'close'):
+                        source.close()
+        except BaseException as e:
+            self.error = e
+        with self.cond:
+            if self.pending is not None:
+                self.slot, self.pending = self.pending, None
+            self.finished = True
+        invalidate()
+
+    async def consume_async(self, source):
+        try:
+            count = 0
+            async for item in source:
+                count += 1
+                if not self.hand_off(item, count):
+                    break
+        finally:
+            await source.aclose()
+
+    def hand_off(self, item, count):
+        """ Put an item into the slot, respecting the rate limit. Return `False` if the stream is cancelled. """
+        if self.backpressure:
+            with self.cond:
+                self.cond.wait_for(lambda: self.slot is None or self.cancelled)
+            delay = self.last + self.interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        with self.cond:
+            if self.cancelled:
+                return False
+            now = time.perf_counter()
+            if now - self.last < self.interval:
+                was_pending, self.pending = self.pending is not None, (item, count)
+                if was_pending:
+                    return True
+            else:
+                self.last = now
+                self.slot, self.pending = (item, count), None
+        # With a pending item, the UI keeps polling until `take` hands it off
+        invalidate()
+        return True
+
+    def take(self):
+        """ Return `(slot, finished)`, emptying the slot. A pending item is handed off once the interval elapses. """
+        with self.cond:
+            now = time.perf_counter()
+            if self.pending is not None and now - self.last >= self.interval:
+                self.last = now
+                self.slot, self.pending = self.pending, None
+            slot, self.slot = self.slot, None
+            pending, finished = self.pending is not None, self.finished
+            self.cond.notify_all()
+        if pending:
+            invalidate()
+        return slot, finished
+
+    def cancel(self):
+        with self.cond:
+            self.cancelled = True
+            self.cond.notify_all()
+
+
+class Stream(object):
+    """ State of the `stream` widget, which shows partial results of a long computation as they arrive.
+
+    The source is a generator or an async generator, which is consumed on a worker thread. Its items are
+    handed off to the UI at most `max_fps` times per second. Without back-pressure, the items produced
+    in between are dropped, so the worker never waits for the UI. The last item is always handed off.
+
+    ```python
+    def solver(n):
+        x = np.zeros(100)
+        for i in range(n):
+            x = step(x)
+            yield x.copy()
+
+    st = c.Stream(solver(1000), total=1000)
+
+    def app():
+        while True:
+            _, x = yield from c.orr([c.stream("Solver", st), c.text(f"Progress: {st.progress:.0%}")])
+            ...
+    ```
+
+    The source is closed when the `Stream` is garbage collected, or `cancel` is called.
+    """
+    def __init__(self, source, total=None, max_fps=60, backpressure=False, executor=None):
+        """
+        Args:
+            source: Generator, iterator, or async generator. Async generators are run in a new event loop.
+            total: Expected number of items, used to compute `progress`.
+            max_fps: Maximum number of hand-offs per second.
+            backpressure: If `True`, the worker waits for the UI to take each item, so that no items are dropped.
+            executor: `concurrent.futures.Executor` to run the worker in. A daemon thread is started if `None`.
+        """
+        self.total = total
+        self.value = None
+        self.count = 0  # Number of items produced up to `value`
+        self.done = False
+        self._channel = _StreamChannel(1 / max_fps, backpressure)
+        if executor is None:
+            threading.Thread(target=self._channel.run, args=(source,), daemon=True).start()
+        else:
+            executor.submit(self._channel.run, source)
+
+    @property
+    def progress(self):
+        """ Fraction of `total` items produced, or `None` if `total` isn't known. """
+        if self.total is None:
+            return None
+        return 1. if self.done else min(1., self.count / self.total)
+
+    def poll(self):
+        """ Take the newest item from the worker, and return `True` if there is one.
+
+        This is called by the `stream` widget in each frame. Exceptions raised by the source are re-raised here.
+        """
+        slot, finished = self._channel.take()
+        if self._channel.error is not None:
+            raise self._channel.error
+        if slot is not None:
+            self.value, self.count = slot
+        self.done = finished
+        return slot is not None
+
+    def cancel(self):
+        """ Stop consuming the source. """
+        self._channel.cancel()
+
+    def __del__(self):
+        self._channel.cancel()
+
+
+def stream(name, state):
+    """ Widget which drives a `Stream`, and returns `(name, value)` whenever a new item arrives. """
+    while True:
+        if state.poll():
+            return name, state.value
+        yield
+
+
+def task(awaitable) -> Widget:
+    """ Run an awaitable, such as a coroutine, as an asyncio task, and return its result.
+
+    This requires a running asyncio event loop, such as the one of `concur.integrations.glfw.main_async`.
+    The task is canceled when the widget is dropped before it finishes.
+
+    ```python
+    yield from c.orr([c.text("Loading..."), c.task(fetch(url))])
+    ```
+    """
+    return Block(asyncio.ensure_future(awaitable))
+
+
 def listen(que):
-    """ Listen for messages in a given queue. """
+    """ Listen for messages in a given queue.
+
+    If the main loop is idle, messages are only noticed after it wakes up. Use `Queue` to wake it up
+    when a message is put in.
+    """
     while True:
         try:
             return que.get_nowait()
@@ -248,6 +894,8 @@ class RemoteAction(object):
         self.que = que
         self.future = future
         self.sent = False
+        if future is not None:
+            future.add_done_callback(_invalidate_on_done)
 
     def __iter__(self):
         return self
@@ -12,6 +12,9 @@ All these widgets have the following in common:
     * A single `int`, specifying ABGR color. For example, `0xffaa0000` is dark blue.
 * `tf` is the `concur.extra_widgets.pan_zoom.TF` object specifying transformations from screen-space to image-space and back.
   If no transformation is supplied, the element is drawn in screen space units.
+* The batched functions (`polylines`, `polygons`, `scatter`, etc.) only draw the shapes which intersect the view given by `tf`.
+  Their few most recently prepared geometries are cached using `concur.core.memoize`, so re-creating them with
+  unchanged arguments is cheap. Use `Retained` to keep the geometry of large or many overlays alive.
 
 Theses widgets are not re-exported in the root module, and are normally used as `c.draw.line(...)`, etc.
 They can be composed normally using the `concur.core.orr` function.
@@ -38,14 +41,310 @@ There are several ways of creating overlays which react to user input.
   [annotation tool](https://github.com/potocpav/annotation-tool/blob/master/annotator.py) example for an usage example.
 """
 
+import ctypes
 import numpy as np
 import imgui
 from concur.colors import color_to_rgba
-from concur.core import nothing
+from concur.core import nothing, memoize
 
 __pdoc__ = dict(prepare_polyline_points=False)
 
 
+# Memory layout of `ImDrawVert` and `ImDrawIdx`, as compiled into PyImGui.
+_draw_vert = np.dtype({
+    'names': ['pos', 'uv', 'col'],
+    'formats': [('<f4', 2), ('<f4', 2), '<u4'],
+    'offsets': [imgui.VERTEX_BUFFER_POS_OFFSET, imgui.VERTEX_BUFFER_UV_OFFSET, imgui.VERTEX_BUFFER_COL_OFFSET],
+    'itemsize': imgui.VERTEX_SIZE,
+    })
+_draw_idx = np.dtype(f'<u{imgui.INDEX_SIZE}')
+
+# Field offsets inside the C++ `ImDrawList` struct (ImGui 1.82, 64-bit).
+_VTX_BUFFER_SIZE, _VTX_BUFFER_DATA = 32, 40
+_IDX_BUFFER_SIZE, _IDX_BUFFER_DATA = 16, 24
+_VTX_CURRENT_IDX, _VTX_WRITE_PTR, _IDX_WRITE_PTR = 52, 72, 80
+
+# Each batched function caches a few results, enough for overlays re-created with the same arguments every frame.
+_memoize_geometry = memoize(maxsize=8, max_bytes=32 << 20)
+
+
+def _draw_list_ptr(draw_list):
+    """ Return the raw `ImDrawList *` wrapped by a PyImGui draw list, or `None` if it can't be found safely.
+
+    PyImGui doesn't expose the pointer, nor a way to submit geometry in bulk. The pointer is read from the
+    Cython object and cross-checked with the public buffer accessors before it is ever written through.
+    """
+    # 16-bit indices would require splitting batches into 64k vertex chunks
+    if ctypes.sizeof(ctypes.c_void_p) != 8 or _draw_idx.itemsize != 4 or type(draw_list).__basicsize__ != 32:
+        return None
+    ptr = ctypes.c_void_p.from_address(id(draw_list) + 24).value
+    if not ptr:
+        return None
+
+    def read(offset, ctype=ctypes.c_void_p):
+        return ctype.from_address(ptr + offset).value
+
+    # `PrimReserve` with zero counts only moves the write pointers to the buffer ends
+    draw_list.prim_reserve(0, 0)
+    vtx_end = draw_list.vtx_buffer_data + draw_list.vtx_buffer_size * _draw_vert.itemsize
+    idx_end = draw_list.idx_buffer_data + draw_list.idx_buffer_size * _draw_idx.itemsize
+    if read(_VTX_BUFFER_DATA) != draw_list.vtx_buffer_data \
+            or read(_IDX_BUFFER_DATA) != draw_list.idx_buffer_data \
+            or read(_VTX_BUFFER_SIZE, ctypes.c_int) != draw_list.vtx_buffer_size \
+            or read(_IDX_BUFFER_SIZE, ctypes.c_int) != draw_list.idx_buffer_size \
+            or read(_VTX_WRITE_PTR) != vtx_end \
+            or read(_IDX_WRITE_PTR) != idx_end:
+        return None
+    return ptr
+
+
+def _prims(draw_list, vtx, indices):
+    """ Widget submitting triangles directly into the draw list buffers, bypassing per-shape Python calls.
+
+    `vtx` is an array of `_draw_vert` in screen-space, and `indices` are the vertex indices of triangles,
+    relative to the first vertex.
+    """
+    ptr = _draw_list_ptr(draw_list)
+    if ptr is None:
+        # Slow path through the public API, writing a separate vertex for every index
+        verts = [(*v['pos'], *v['uv'], int(v['col'])) for v in vtx[indices]]
+        while True:
+            draw_list.prim_reserve(len(verts), len(verts))
+            for v in verts:
+                draw_list.prim_vtx(*v)
+            yield
+    vtx_current_idx = ctypes.c_uint.from_address(ptr + _VTX_CURRENT_IDX)
+    vtx_write_ptr = ctypes.c_void_p.from_address(ptr + _VTX_WRITE_PTR)
+    idx_write_ptr = ctypes.c_void_p.from_address(ptr + _IDX_WRITE_PTR)
+    while True:
+        draw_list.prim_reserve(len(indices), len(vtx))
+        vtx_dst, idx_dst = vtx_write_ptr.value, idx_write_ptr.value
+        idx = indices + _draw_idx.type(vtx_current_idx.value)
+        ctypes.memmove(vtx_dst, vtx.ctypes.data, vtx.nbytes)
+        ctypes.memmove(idx_dst, idx.ctypes.data, idx.nbytes)
+        # Advance the write cursors the same way `PrimWriteVtx` and `PrimWriteIdx` would
+        vtx_current_idx.value += len(vtx)
+        vtx_write_ptr.value = vtx_dst + vtx.nbytes
+        idx_write_ptr.value = idx_dst + idx.nbytes
+        yield
+
+
+# Fraction of the view size by which translatable batches are culled beyond each side of the view
+_PAN_MARGIN = 0.5
+
+
+class _Batch(object):
+    """ Triangles of a single color, cached for the last view transformation.
+
+    `shapes` is an array of `n` shapes in content-space, and `triangulate(shapes, c2s)` returns screen-space
+    vertices and triangle indices for any subset of them (`c2s` is `None` for screen-space input).
+    `bounds` are the content-space bounding boxes of the shapes with shape `(n, 4)`, and `pad` is the
+    screen-space distance in pixels by which shapes may extend beyond their bounds, e.g. due to line thickness.
+    Shapes outside of the view are culled.
+
+    If the triangles are only shifted when the view is panned, `translatable` should be set,
+    so that panning doesn't re-triangulate. Then, the shapes are culled against the view enlarged by
+    `_PAN_MARGIN` of its size on each side, and the triangles are re-used as long as the view stays inside.
+    """
+    def __init__(self, shapes, triangulate, bounds, pad, color, translatable=True):
+        self.shapes = shapes
+        self.triangulate = triangulate
+        self.bounds = bounds
+        self.pad = pad
+        self.col = color_to_rgba(color)
+        self.translatable = translatable
+        self.total_bounds = np.concatenate([bounds[:, :2].min(0), bounds[:, 2:].max(0)]) if len(bounds) else None
+        self.index, self.n_queries = None, 0
+        self.c2s, self.view, self.vtx, self.indices = None, None, None, None
+        self.base_c2s, self.base_rect, self.base_vtx = None, None, None
+
+    def geometry(self, tf):
+        """ Return screen-space vertices and indices for a given `concur.extra_widgets.pan_zoom.TF`. """
+        c2s = None if tf is None else tf.c2s
+        view = None if tf is None else tf.view_c
+        if self.vtx is not None and (c2s is self.c2s or _same_matrix(c2s, self.c2s)) and view == self.view:
+            return self.vtx, self.indices
+        if self.translatable and self.base_c2s is not None and c2s is not None \
+                and np.array_equal(c2s[:, :2], self.base_c2s[:, :2]) \
+                and _contains(self.base_rect, self.cull_rect(c2s, view)):
+            vtx = self.base_vtx.copy()
+            vtx['pos'] += c2s[:, 2] - self.base_c2s[:, 2]
+        else:
+            rect = self.cull_rect(c2s, view, _PAN_MARGIN if self.translatable else 0)
+            ids = self.visible(rect)
+            positions, indices = self.triangulate(self.shapes if ids is None else self.shapes[ids], c2s)
+            vtx = _vertices(positions, self.col)
+            self.indices = np.ascontiguousarray(indices, _draw_idx)
+            # `None` stands for all the shapes, which can be panned anywhere
+            self.base_c2s, self.base_rect, self.base_vtx = c2s, None if ids is None else rect, vtx
+        self.c2s, self.view, self.vtx = c2s, view, vtx
+        return self.vtx, self.indices
+
+    def cull_rect(self, c2s, view, margin=0):
+        """ Content-space rectangle of the `view` enlarged by the padding and by `margin` of its size,
+        or `None` if there is no view.
+        """
+        if c2s is None or view is None:
+            return None
+        l, t, r, b = view
+        pad_x = self.pad / abs(c2s[0, 0]) + abs(r - l) * margin
+        pad_y = self.pad / abs(c2s[1, 1]) + abs(b - t) * margin
+        return [min(l, r) - pad_x, min(t, b) - pad_y, max(l, r) + pad_x, max(t, b) + pad_y]
+
+    def visible(self, rect):
+        """ Indices of shapes intersecting a `cull_rect`, or `None` if all of them are visible. """
+        if rect is None or self.total_bounds is None:
+            return None
+        if rect[0] <= self.total_bounds[0] and rect[1] <= self.total_bounds[1] \
+                and rect[2] >= self.total_bounds[2] and rect[3] >= self.total_bounds[3]:
+            return None
+        # The index pays off only if the batch is queried repeatedly, as is the case with `Retained`
+        self.n_queries += 1
+        if self.index is None and self.n_queries > 1:
+            self.index = _GridIndex(self.bounds)
+        if self.index is None:
+            return np.flatnonzero(_intersects(self.bounds, rect))
+        return self.index.query(rect)
+
+    def widget(self, tf):
+        return _triangles(*self.geometry(tf))
+
+
+class _GridIndex(object):
+    """ Uniform grid over bounding boxes with shape `(n, 4)`, finding the boxes which intersect a rectangle.
+
+    Boxes are stored in the grid cell containing their center. Boxes larger than a cell are kept aside,
+    and they are tested on every query.
+    """
+    def __init__(self, bounds, boxes_per_cell=4):
+        self.bounds = bounds
+        self.n_cells = max(1, int(np.sqrt(len(bounds) / boxes_per_cell)))
+        self.lo = bounds[:, :2].min(0)
+        extent = bounds[:, 2:].max(0) - self.lo
+        self.cell = np.where(extent > 0, extent / self.n_cells, 1)
+        large = np.any(bounds[:, 2:] - bounds[:, :2] > self.cell, axis=1)
+        self.large = np.flatnonzero(large)
+        small = np.flatnonzero(~large)
+        cx, cy = self._cells((bounds[small, :2] + bounds[small, 2:]) / 2)
+        cell_ids = cy * self.n_cells + cx
+        order = np.argsort(cell_ids, kind='stable')
+        self.ids = small[order]
+        self.starts = np.searchsorted(cell_ids[order], np.arange(self.n_cells ** 2 + 1))
+
+    def _cells(self, points):
+        return np.clip(((points - self.lo) // self.cell).astype(int), 0, self.n_cells - 1).T
+
+    def query(self, rect):
+        """ Sorted indices of boxes intersecting `rect` given as `[left, top, right, bottom]`. """
+        # Centers of small intersecting boxes are at most half a cell outside of `rect`
+        (x0, x1), (y0, y1) = self._cells(np.array([rect[:2], rect[2:]]) + [-self.cell / 2, self.cell / 2])
+        rows = [self.starts[[y * self.n_cells + x0, y * self.n_cells + x1 + 1]] for y in range(y0, y1 + 1)]
+        candidates = np.concatenate([self.ids[i:j] for i, j in rows] + [self.large])
+        return np.sort(candidates[_intersects(self.bounds[candidates], rect)])
+
+
+def _vertices(positions, col):
+    vtx = np.empty(len(positions), _draw_vert)
+    vtx['pos'] = positions
+    # Solid color is obtained by sampling the white pixel in the font atlas
+    vtx['uv'] = imgui.get_font_tex_uv_white_pixel()
+    vtx['col'] = col
+    return vtx
+
+
+def _triangles(vtx, indices):
+    if len(indices) == 0:
+        return nothing()
+    return _prims(imgui.get_window_draw_list(), vtx, indices)
+
+
+def _intersects(bounds, rect):
+    return (bounds[:, 0] <= rect[2]) & (bounds[:, 2] >= rect[0]) & (bounds[:, 1] <= rect[3]) & (bounds[:, 3] >= rect[1])
+
+
+def _same_matrix(a, b):
+    return a is not None and b is not None and np.array_equal(a, b)
+
+
+def _contains(outer, inner):
+    """ Whether the rectangle `outer` contains `inner`. `None` is an unbounded rectangle. """
+    if outer is None:
+        return True
+    return inner is not None and outer[0] <= inner[0] and outer[1] <= inner[1] \
+        and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def _affine(points, c2s):
+    """ Transform points with shape `(..., 2)` by a `(2, 3)` matrix, like `TF.transform`. """
+    return points if c2s is None else np.matmul(points, c2s[:, :2].T) + c2s[:, 2]
+
+
+def _batch_points(points):
+    points = np.asarray(points, dtype=float)
+    if points.size == 0:
+        return np.zeros((0, 0, 2))
+    return points
+
+
+def _point_bounds(points):
+    """ Bounding boxes of `(n, m, 2)` point sets. """
+    if points.size == 0:
+        return np.zeros((len(points), 4))
+    return np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1)
+
+
+def _fan_geometry(polys):
+    """ Triangulate `(n, m, 2)` convex polygons as triangle fans. Returns vertices and indices. """
+    n, m = polys.shape[:2]
+    if m < 3:
+        return np.zeros((0, 2)), np.zeros(0, _draw_idx)
+    fan = np.stack([np.zeros(m - 2, int), np.arange(1, m - 1), np.arange(2, m)], axis=1).ravel()
+    return polys.reshape(-1, 2), (np.arange(n).reshape(-1, 1) * m + fan).ravel()
+
+
+def _polyline_geometry(points, closed, thickness):
+    """ Triangulate `(n, m, 2)` polylines into one quad per segment, like the non-anti-aliased
+    `ImDrawList::AddPolyline`. Returns vertices and indices.
+    """
+    if closed:
+        p0, p1 = points, np.roll(points, -1, axis=1)
+    else:
+        p0, p1 = points[:, :-1], points[:, 1:]
+    d = p1 - p0
+    d /= np.maximum(np.hypot(d[..., 0], d[..., 1]), 1e-12)[..., np.newaxis]
+    nrm = np.stack([d[..., 1], -d[..., 0]], axis=-1) * (thickness / 2)
+    quads = np.stack([p0 + nrm, p1 + nrm, p1 - nrm, p0 - nrm], axis=-2)
+    return _fan_geometry(quads.reshape(-1, 4, 2))
+
+
+@_memoize_geometry
+def _polylines(points, color, closed=False, thickness=1):
+    points = _batch_points(points)
+    return _Batch(
+        points, lambda pts, c2s: _polyline_geometry(_affine(pts, c2s), closed, thickness),
+        _point_bounds(points), thickness / 2, color)
+
+
+@_memoize_geometry
+def _polygons(points, color):
+    points = _batch_points(points)
+    return _Batch(points, lambda pts, c2s: _fan_geometry(_affine(pts, c2s)), _point_bounds(points), 1, color)
+
+
+@_memoize_geometry
+def _rects(rects, color, thickness=1):
+    rects = np.asarray(rects, dtype=float).reshape(-1, 2, 2)
+
+    def triangulate(rects, c2s):
+        r = _affine(rects, c2s)
+        # Avoid issues with disappearing lines on very large rectangles
+        r = np.clip(r, -8192, 8192)
+        polys = np.stack([r[:, 0], r[:, [0, 1], [0, 1]], r[:, 1], r[:, [1, 0], [0, 1]]], axis=1)
+        return _polyline_geometry(polys, True, thickness)
+    # Clipping doesn't commute with panning
+    return _Batch(rects, triangulate, _point_bounds(rects), thickness / 2, color, translatable=False)
+
+
 def line(x0, y0, x1, y1, color, thickness=1, tf=None):
     """ Line connecting two points. """
     if tf is not None:
@@ -76,25 +375,7 @@ def rects(rects, color, thickness=1, tf=None):
 
     `rects` is a NumPy array of shape `(n, 4)`, where `n` is the number of rectangles.
     """
-    if len(rects) == 0:
-        while True:
-            yield
-    if tf is not None:
-        rects = tf.transform(rects.reshape(-1, 2)).reshape(rects.shape)
-    # Avoid issues with disappearing lines on very large rectangles
-    rects = np.clip(rects, -8192, 8192)
-    polys = np.empty((len(rects), 4, 2), dtype=rects.dtype)
-    polys[:, 0] = rects[:, :2]
-    polys[:, 1, 0] = rects[:, 0]
-    polys[:, 1, 1] = rects[:, 3]
-    polys[:, 2] = rects[:, 2:]
-    polys[:, 3, 0] = rects[:, 2]
-    polys[:, 3, 1] = rects[:, 1]
-    draw_list = imgui.get_window_draw_list()
-    col = color_to_rgba(color)
-    while True:
-        draw_list.add_polylines(polys, col, True, thickness)
-        yield
+    return _rects(rects, color, thickness).widget(tf)
 
 
 def rect_filled(x0, y0, x1, y1, color, rounding=0, tf=None):
@@ -175,78 +456,42 @@ def triangle(points, color, tf=None):
 def polylines(points, color, closed=False, thickness=1, tf=None):
     """ Multiple polygonal lines with the same length and parameters.
 
-    Calling this function is more efficient than calling `polyline` multiple times, because all the data is given
-    to the C++ back-end in one Python call, and because transformation is vectorized.
+    Calling this function is more efficient than calling `polyline` multiple times, because all the
+    geometry is written into the draw list in one batch, and because transformation is vectorized.
+    Lines are not anti-aliased.
 
     `points` is a NumPy array with shape `(n, m, 2)`, where `n` is the number of polylines, and `m` is the number of points
     in each polyline.
     """
-    if len(points) == 0:
-        while True:
-            yield
-    if tf is not None:
-        points = tf.transform(points.reshape(-1, 2)).reshape(points.shape)
-    draw_list = imgui.get_window_draw_list()
-    col = color_to_rgba(color)
-    while True:
-        # TODO: reintroduce native add_polylines for optimization
-        for polyline_pts in points:
-            draw_list.add_polyline(list(polyline_pts), col, closed, thickness)
-        # draw_list.add_polylines(points, col, closed, thickness)
-        yield
+    return _polylines(points, color, closed, thickness).widget(tf)
 
 
 def polygons(points, color, tf=None):
     """ Multiple filled polygons with the same length and color.
 
-    Calling this function is more efficient than calling `polygon` multiple times, because all the data is given
-    to the C++ back-end in one Python call, and because transformation is vectorized.
+    Calling this function is more efficient than calling `polygon` multiple times, because all the
+    geometry is written into the draw list in one batch, and because transformation is vectorized.
 
     `points` is a NumPy array with shape `(n, m, 2)`, where `n` is the number of polygons, and `m` is the number of points
     in each polyline.
     """
-    if tf is not None:
-        points = tf.transform(points.reshape(-1, 2)).reshape(points.shape)
-    draw_list = imgui.get_window_draw_list()
-    col = color_to_rgba(color)
-    while True:
-        # TODO: reintroduce native add_polylines for optimization
-        for polygon_pts in points:
-            draw_list.add_convex_poly_filled(list(polygon_pts), col, closed, thickness)
-        # draw_list.add_convex_polys_filled(points, col)
-        yield
+    return _polygons(points, color).widget(tf)
 
 
 def triangles(points, color, tf=None):
     """ Multiple filled triangles with the same color.
 
-    `points` is a NumPy array with shape `(n, 3, 2)`, where `n` is the number of quads
+    `points` is a NumPy array with shape `(n, 3, 2)`, where `n` is the number of triangles.
     """
-    if tf is not None:
-        points = tf.transform(points.reshape(-1, 2)).reshape(points.shape)
-    draw_list = imgui.get_window_draw_list()
-    col = color_to_rgba(color)
-    while True:
-        # TODO: introduce native add_triangles for optimization, or remove this function and use polygons()
-        for pts in points:
-            draw_list.add_triangle_filled(pts[0,0], pts[0,1], pts[1, 0], pts[1, 1], pts[2, 0], pts[2, 1], col)
-        yield
+    return polygons(points, color, tf=tf)
 
 
 def quads(points, color, tf=None):
     """ Multiple filled quads with the same color.
 
-    `points` is a NumPy array with shape `(n, 4, 2)`, where `n` is the number of quads
+    `points` is a NumPy array with shape `(n, 4, 2)`, where `n` is the number of quads.
     """
-    if tf is not None:
-        points = tf.transform(points.reshape(-1, 2)).reshape(points.shape)
-    draw_list = imgui.get_window_draw_list()
-    col = color_to_rgba(color)
-    while True:
-        # TODO: introduce native add_quads for optimization, or remove this function and use polygons()
-        for pts in points:
-            draw_list.add_quad_filled(pts[0,0], pts[0,1], pts[1, 0], pts[1, 1], pts[2, 0], pts[2, 1], pts[3, 0], pts[3, 1], col)
-        yield
+    return polygons(points, color, tf=tf)
 
 
 def text(string, x, y, color, tf=None):
@@ -298,8 +543,13 @@ def ellipses(means, covs, sd, color, thickness=1, num_segments=16, tf=None):
     The call is very similar to `ellipse`, but `mean` and `cov` are vectorized: there is one more dimension (zeroth) for both.
     For `n` ellipses, the shape of `mean` is `(n, 2)`, and the shape of `cov` is `(n, 2, 2)`.
     """
+    return _ellipses(means, covs, sd, color, thickness, num_segments).widget(tf)
+
+
+@_memoize_geometry
+def _ellipses(means, covs, sd, color, thickness=1, num_segments=16):
     if len(means) == 0 and len(covs) == 0:
-        return nothing()
+        return _polylines([], color)
     assert len(means) == len(covs)
     assert len(means.shape) == 2 and means.shape[1] == 2
     assert len(covs.shape) == 3 and covs.shape[1] == 2 and covs.shape[2] == 2
@@ -311,7 +561,7 @@ def ellipses(means, covs, sd, color, thickness=1, num_segments=16, tf=None):
     e2 = es[:, 1].reshape(-1, 1, 1)
     t = np.linspace(0, np.pi*2, num_segments, endpoint=False).reshape(-1, 1)
     el = v1 * np.sin(t) * np.sqrt(e1) * sd + v2 * np.cos(t) * np.sqrt(e2) * sd
-    return polylines(el + means.reshape(-1, 1, 2), color, True, thickness, tf=tf)
+    return _polylines(el + means.reshape(-1, 1, 2), color, True, thickness)
 
 
 def scatter(pts, color, marker, marker_size=10, thickness=1, tf=None):
@@ -340,65 +590,209 @@ def scatter(pts, color, marker, marker_size=10, thickness=1, tf=None):
     `"|"`  | vertical line
     `"-"`  | horizontal line
     """
+    return _scatter(pts, color, marker, marker_size, thickness).widget(tf)
+
+
+@_memoize_geometry
+def _scatter(pts, color, marker, marker_size=10, thickness=1):
     if len(pts) == 0:
         pts = pts.reshape(-1, 2)
     assert len(pts.shape) == 2 and pts.shape[1] == 2
-    if tf is not None:
-        pts = tf.transform(pts)
 
+    # Marker shapes with shape `(k, m, 2)`: `k` polygons with `m` vertices, relative to the marker center
+    r = marker_size / 2
+    filled, closed = False, False
     if marker == '.':
-        r = marker_size / 2
-        polys = np.empty((len(pts), 4, 2))
-        polys[:, 0, :] = pts + [-r, -r]
-        polys[:, 1, :] = pts + [r, -r]
-        polys[:, 2, :] = pts + [r, r]
-        polys[:, 3, :] = pts + [-r, r]
-        # return polygons(polys, color) # TODO: add add_convex_poly_filled function
-        return quads(polys, color)
+        shapes = [[(-r, -r), (r, -r), (r, r), (-r, r)]]
+        filled = True
     elif marker == '+':
-        r = marker_size / 2
-        polys = np.empty((len(pts) * 2, 2, 2))
-        polys[0::2, 0, :] = pts - [r, 0]
-        polys[0::2, 1, :] = pts + [r, 0]
-        polys[1::2, 0, :] = pts - [0, r]
-        polys[1::2, 1, :] = pts + [0, r]
-        return polylines(polys, color, False, thickness)
+        shapes = [[(-r, 0), (r, 0)], [(0, -r), (0, r)]]
     elif marker in ['X', 'x', '×']:
         r = marker_size / np.sqrt(8)
-        polys = np.empty((len(pts) * 2, 2, 2))
-        polys[0::2, 0, :] = pts - [r, r]
-        polys[0::2, 1, :] = pts + [r, r]
-        polys[1::2, 0, :] = pts - [-r, r]
-        polys[1::2, 1, :] = pts + [-r, r]
-        return polylines(polys, color, False, thickness)
+        shapes = [[(-r, -r), (r, r)], [(r, -r), (-r, r)]]
     elif marker in ['O', 'o']:
-        r = marker_size / 2
-        n_verts = 7
-        t = np.linspace(0, np.pi * 2, n_verts, endpoint=False)
-        polys = np.empty((len(pts), n_verts, 2))
-        polys[..., 0] = np.sin(t) * r
-        polys[..., 1] = np.cos(t) * r
-        polys += pts.reshape(-1, 1, 2)
-        return polylines(polys, color, True, thickness)
+        t = np.linspace(0, np.pi * 2, 7, endpoint=False)
+        shapes = [np.stack([np.sin(t) * r, np.cos(t) * r], axis=1)]
+        closed = True
     elif marker in ['s', 'S']:
-        r = marker_size / 2
         t = np.pi/4 + np.linspace(0, np.pi * 2, 4, endpoint=False)
-        polys = np.empty((len(pts), 4, 2))
-        polys[..., 0] = np.sin(t) * r
-        polys[..., 1] = np.cos(t) * r
-        polys += pts.reshape(-1, 1, 2)
-        return polylines(polys, color, True, thickness)
+        shapes = [np.stack([np.sin(t) * r, np.cos(t) * r], axis=1)]
+        closed = True
     elif marker == '|':
-        r = marker_size / 2
-        polys = np.empty((len(pts), 2, 2))
-        polys[:, 0, :] = pts - [0, r]
-        polys[:, 1, :] = pts + [0, r]
-        return polylines(polys, color, False, thickness)
+        shapes = [[(0, -r), (0, r)]]
     elif marker == '-':
-        r = marker_size / 2
-        polys = np.empty((len(pts), 2, 2))
-        polys[:, 0, :] = pts - [r, 0]
-        polys[:, 1, :] = pts + [r, 0]
-        return polylines(polys, color, False, thickness)
+        shapes = [[(-r, 0), (r, 0)]]
     else:
         raise ValueError('Invalid marker')
+    shapes = np.array(shapes, dtype=float)
+
+    def triangulate(pts, c2s):
+        polys = (_affine(pts, c2s)[:, np.newaxis, np.newaxis] + shapes).reshape(-1, *shapes.shape[1:])
+        return _fan_geometry(polys) if filled else _polyline_geometry(polys, closed, thickness)
+    pad = np.abs(shapes).max() + thickness / 2
+    return _Batch(pts, triangulate, np.concatenate([pts, pts], axis=1), pad, color)
+
+
+def lod_polyline(x, y, color, thickness=1, tf=None):
+    """ Polygonal line through points `(x[i], y[i])`, where `x` is monotonically non-decreasing.
+
+    This is meant for long signals, such as time series plotted inside `concur.extra_widgets.frame.frame`.
+    Samples falling into the same pixel column are decimated to their minimum and maximum, so at most
+    about two vertices per pixel column are drawn, and the line looks the same as one drawn using `polyline`.
+    A min/max pyramid is built over the samples when the line is created. It is best to create the line
+    only once using `Retained`:
+
+    ```python
+    signal = c.draw.Retained(c.draw.lod_polyline, t, values, 'black')
+    ```
+
+    `x` and `y` are one-dimensional arrays of the same length. Lines are not anti-aliased.
+    """
+    return _lod_polyline(x, y, color, thickness).widget(tf)
+
+
+class _LodPolyline(object):
+    """ Min/max pyramid over samples with monotonic `x`.
+
+    Level `k` holds the indices of the minimum and of the maximum sample in each block of `2 ** (k + 1)` samples.
+    """
+    def __init__(self, x, y, color, thickness=1):
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        assert len(x.shape) == 1 and x.shape == y.shape, "`x` and `y` must be one-dimensional and equally long"
+        assert np.all(np.diff(x) >= 0), "`x` must be monotonically non-decreasing"
+        self.x, self.y = x, y
+        self.col = color_to_rgba(color)
+        self.thickness = thickness
+        self.levels = []
+        lo = hi = np.arange(len(y), dtype=np.int32 if len(y) < 2 ** 31 else np.int64)
+        while len(lo) > 1:
+            if len(lo) % 2:
+                lo, hi = np.append(lo, lo[-1]), np.append(hi, hi[-1])
+            lo = np.where(y[lo[1::2]] < y[lo[0::2]], lo[1::2], lo[0::2])
+            hi = np.where(y[hi[1::2]] > y[hi[0::2]], hi[1::2], hi[0::2])
+            self.levels.append((lo, hi))
+        self.c2s, self.view, self.vtx, self.indices = None, None, None, None
+
+    def samples(self, c2s, view):
+        """ Indices of the samples to draw: the minimum and the maximum sample of each pixel column in `view`.
+
+        If there are fewer samples than pixel columns, all of them are drawn.
+        """
+        x = self.x
+        if view is None:
+            i0, i1 = 0, len(x)
+        else:
+            # Include one sample on each side, so that the line continues past the view boundary
+            i0 = max(0, np.searchsorted(x, min(view[0], view[2])) - 1)
+            i1 = min(len(x), np.searchsorted(x, max(view[0], view[2]), 'right') + 1)
+        scale, offset = (1, 0) if c2s is None else (c2s[0, 0], c2s[0, 2])
+        if i1 - i0 < 2 or scale == 0:
+            return np.arange(i0, i1)
+        cols = np.floor(np.array([x[i0], x[i1 - 1]]) * scale + offset)
+        c0, c1 = cols.min(), cols.max()
+        if i1 - i0 <= c1 - c0 + 1:
+            return np.arange(i0, i1)
+        # Sample ranges `[bounds[j], bounds[j + 1])` falling into the pixel columns
+        edges = np.sort((np.arange(c0 + 1, c1 + 1) - offset) / scale)
+        bounds = np.concatenate([[i0], np.clip(np.searchsorted(x, edges), i0, i1), [i1]])
+        lo, hi = self._extremes(bounds[:-1], bounds[1:])
+        idx = np.stack([np.minimum(lo, hi), np.maximum(lo, hi)], axis=1)[lo >= 0].ravel()
+        return np.unique(np.concatenate([[i0, i1 - 1], idx]))
+
+    def _extremes(self, a, b):
+        """ Indices of the minimum and of the maximum sample in each range `[a[j], b[j])`, or -1 if it is empty.
+
+        Each range is split into aligned blocks of the pyramid, at most two per level.
+        """
+        y = self.y
+        lo, hi = np.full(len(a), -1), np.full(len(a), -1)
+        a, b = a.copy(), b.copy()
+
+        def add(j, level, block):
+            cand_lo, cand_hi = self.levels[level - 1] if level else (None, None)
+            cand_lo = block if cand_lo is None else cand_lo[block]
+            cand_hi = block if cand_hi is None else cand_hi[block]
+            better = (lo[j] < 0) | (y[cand_lo] < y[lo[j]])
+            lo[j[better]] = cand_lo[better]
+            better = (hi[j] < 0) | (y[cand_hi] > y[hi[j]])
+            hi[j[better]] = cand_hi[better]
+
+        for level in range(len(self.levels) + 1):
+            j = np.flatnonzero((a < b) & ((a >> level) & 1 == 1))
+            add(j, level, a[j] >> level)
+            a[j] += 1 << level
+            j = np.flatnonzero((a < b) & ((b >> level) & 1 == 1))
+            add(j, level, (b[j] >> level) - 1)
+            b[j] -= 1 << level
+            if not np.any(a < b):
+                break
+        return lo, hi
+
+    def geometry(self, tf):
+        """ Return screen-space vertices and indices for a given `concur.extra_widgets.pan_zoom.TF`. """
+        c2s = None if tf is None else tf.c2s
+        view = None if tf is None else tf.view_c
+        if self.vtx is not None and (c2s is self.c2s or _same_matrix(c2s, self.c2s)) and view == self.view:
+            return self.vtx, self.indices
+        idx = self.samples(c2s, view)
+        points = _affine(np.stack([self.x[idx], self.y[idx]], axis=1)[np.newaxis], c2s)
+        positions, indices = _polyline_geometry(points, False, self.thickness)
+        self.c2s, self.view = c2s, view
+        self.vtx, self.indices = _vertices(positions, self.col), np.ascontiguousarray(indices, _draw_idx)
+        return self.vtx, self.indices
+
+    def widget(self, tf):
+        return _triangles(*self.geometry(tf))
+
+
+_lod_polyline = _memoize_geometry(_LodPolyline)
+
+
+class Retained(object):
+    """ Batched overlay geometry which is kept alive across frames and widget re-creations.
+
+    Overlays of `concur.extra_widgets.image.image` and `concur.extra_widgets.frame.frame` are re-created by
+    `content_gen` whenever the view is panned or zoomed, so the batched functions (`polylines`, `polygons`,
+    `triangles`, `quads`, `rects`, `ellipses`, `scatter`, and `lod_polyline`) look up their prepared geometry
+    in the cache again, which hashes all of their points. A `Retained` object prepares its own geometry, bypassing
+    the cache, holds onto it, and keeps the screen-space result between calls. Retained objects created with equal
+    arguments don't share any state.
+    If the view didn't change, the previous geometry is re-used as is. If the view was only panned,
+    it is shifted. Only zooming triangulates it anew. Shapes outside of the view are skipped, which is
+    sped up by a spatial index built over their bounding boxes.
+
+    Create the object once, outside of the event loop, and call it with `tf` inside `content_gen`:
+
+    ```python
+    markers = c.draw.Retained(c.draw.scatter, pts, 'white', 'x')
+
+    while True:
+        _, im = yield from c.image("Image", im, content_gen=markers)
+        yield
+    ```
+
+    Because a `Retained` object holds onto its input, it isn't updated if the input array is later modified in place.
+    """
+    def __init__(self, shape, *args, **kwargs):
+        """ `shape` is one of the batched functions listed above, and the remaining arguments
+        are passed to it, apart from `tf`.
+        """
+        if shape not in _batches:
+            raise ValueError(f"Only {', '.join(f.__name__ for f in _batches)} can be retained.")
+        self._batch = _batches[shape].__wrapped__(*args, **kwargs)
+
+    def __call__(self, tf=None):
+        """ Create a widget drawing the geometry transformed by `tf`. """
+        return self._batch.widget(tf)
+
+
+_batches = {
+    polylines: _polylines,
+    polygons: _polygons,
+    triangles: _polygons,
+    quads: _polygons,
+    rects: _rects,
+    ellipses: _ellipses,
+    scatter: _scatter,
+    lod_polyline: _lod_polyline,
+    }
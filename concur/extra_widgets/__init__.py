@@ -4,5 +4,7 @@
 
 from .frame import *
 from .image import *
+from .tiled_image import *
+from .image_source import *
 from .pan_zoom import *
 from .draggable import *
@@ -6,7 +6,7 @@ import numpy as np
 
 from concur.extra_widgets.pan_zoom import PanZoom, pan_zoom
 import concur.draw as draw
-from concur.core import lift, orr, optional, map
+from concur.core import lift, orr, optional, map, memoize
 
 
 margins = [50, 10, -10, -20]
@@ -27,14 +27,17 @@ class Frame(PanZoom):
         super().__init__(top_left, bottom_right, keep_aspect=keep_aspect, fix_axis=fix_axis, margins=margins)
 
 
-def _frame(content_gen, show_grid, tf, event_gen):
+@memoize(maxsize=16)
+def _axes(view_s, c2s, s2c):
+    """ Viewport, tick positions, and tick labels in screen-space for a given view.
 
+    Returns `(viewport_s, ticks)`, where `ticks` is `(hticks_s, vticks_s, labels)`, or `None` if the viewport is empty.
+    """
     min_tick_spacing = 50
-    viewport_s = [r + o for r, o in zip(tf.view_s, margins)]
-    viewport_c = np.concatenate([np.matmul(tf.s2c, [*viewport_s[:2], 1])[:2], np.matmul(tf.s2c, [*viewport_s[2:], 1])[:2]])
-    bg = draw.rect_filled(*tf.view_s, (1, 1, 1, 1))
+    viewport_s = [r + o for r, o in zip(view_s, margins)]
+    viewport_c = np.concatenate([np.matmul(s2c, [*viewport_s[:2], 1])[:2], np.matmul(s2c, [*viewport_s[2:], 1])[:2]])
     if viewport_s[2] <= viewport_s[0] or viewport_s[3] <= viewport_s[1]:
-        return bg
+        return viewport_s, None
 
     def ticks(a, b, max_n_ticks):
         a, b = min(a, b), max(a, b)
@@ -50,31 +53,35 @@ def _frame(content_gen, show_grid, tf, event_gen):
 
     hticks_c = ticks(viewport_c[3], viewport_c[1], (viewport_s[3] - viewport_s[1]) / min_tick_spacing)
     vticks_c = ticks(viewport_c[2], viewport_c[0], (viewport_s[2] - viewport_s[0]) / min_tick_spacing)
-    hticks_s = np.matmul(tf.c2s, np.stack([np.zeros_like(hticks_c), hticks_c, np.ones_like(hticks_c)]))[1]
-    vticks_s = np.matmul(tf.c2s, np.stack([vticks_c, np.zeros_like(vticks_c), np.ones_like(vticks_c)]))[0]
+    hticks_s = np.matmul(c2s, np.stack([np.zeros_like(hticks_c), hticks_c, np.ones_like(hticks_c)]))[1]
+    vticks_s = np.matmul(c2s, np.stack([vticks_c, np.zeros_like(vticks_c), np.ones_like(vticks_c)]))[0]
+
+    def tick_format(ticks_c, align):
+        mag = max(1, abs(ticks_c[0]), abs(ticks_c[-1]))
+        stride = abs(ticks_c[1] - ticks_c[0]) if len(ticks_c) > 1 else 1
+        some_negative = ticks_c[0] < 0 or ticks_c[-1] < 0
+        msd = int(np.floor(np.log10(mag)))
+        lsd = int(np.minimum(0, np.floor(np.log10(stride))))
+        if 1 + msd - lsd + (lsd < 0) + some_negative > 6:
+            format = f"{{:{align}6.1g}}"
+        else:
+            format = f"{{:{align}6.{-lsd}f}}"
+        return format
+
+    labels = [(tick_format(vticks_c, "<").format(tc), ts, viewport_s[3]) for ts, tc in zip(vticks_s, vticks_c)] \
+        + [(tick_format(hticks_c, ">").format(tc), viewport_s[0] - 45, ts - 7) for ts, tc in zip(hticks_s, hticks_c)]
+    return viewport_s, (hticks_s, vticks_s, labels)
+
+
+def _frame(content_gen, show_grid, tf, event_gen):
+    viewport_s, ticks = _axes(tuple(tf.view_s), tf.c2s, tf.s2c)
+    bg = draw.rect_filled(*tf.view_s, (1, 1, 1, 1))
+    if ticks is None:
+        return bg
+    hticks_s, vticks_s, labels = ticks
 
     def tick_labels():
-        def tick_format(ticks_c, align):
-            mag = max(1, abs(ticks_c[0]), abs(ticks_c[-1]))
-            stride = abs(ticks_c[1] - ticks_c[0]) if len(ticks_c) > 1 else 1
-            some_negative = ticks_c[0] < 0 or ticks_c[-1] < 0
-            msd = int(np.floor(np.log10(mag)))
-            lsd = int(np.minimum(0, np.floor(np.log10(stride))))
-            if 1 + msd - lsd + (lsd < 0) + some_negative > 6:
-                format = f"{{:{align}6.1g}}"
-            else:
-                format = f"{{:{align}6.{-lsd}f}}"
-            return format
-            print(f"msd: {msd}, stride: {lsd}, n_chars: {1 + msd - lsd + (lsd < 0) + some_negative}")
-            format_x = f"{{:<6.{-lsd}f}}"
-            format_y = f"{{:>6.{-lsd}f}}"
-        xtick_labels = [
-            draw.text(tick_format(vticks_c, "<").format(tc), ts, viewport_s[3], (0, 0, 0, 1))
-            for ts, tc in zip(vticks_s, vticks_c)]
-        ytick_labels = [
-            draw.text(tick_format(hticks_c, ">").format(tc), viewport_s[0] - 45, ts - 7, (0, 0, 0, 1))
-            for ts, tc in zip(hticks_s, hticks_c)]
-        return orr(xtick_labels + ytick_labels)
+        return orr([draw.text(label, x, y, (0, 0, 0, 1)) for label, x, y in labels])
 
     def grid():
         hlines = [draw.line(tf.view_s[0], tick, tf.view_s[2], tick, (0, 0, 0, 0.3)) for tick in hticks_s]
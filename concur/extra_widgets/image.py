@@ -8,7 +8,7 @@ import imgui
 from concur.widgets import child
 from concur.draw import image as raw_image
 from concur.extra_widgets.pan_zoom import PanZoom, pan_zoom
-from concur.core import orr, optional
+from concur.core import orr, optional, lift
 
 
 def image(name, state, width=None, height=None, content_gen=None, drag_tag=None, down_tag=None, hover_tag=None):
@@ -61,6 +61,7 @@ def image(name, state, width=None, height=None, content_gen=None, drag_tag=None,
         else:
             kwargs = dict(tf=tf)
         return orr([
+            lift(state._commit_stream),
             raw_image(state.tex_id, 0, 0, state.tex_w, state.tex_h, uv_b=state.tex_uv_b, tf=tf),
             optional(content_gen is not None, content_gen, **kwargs),
         ])
@@ -77,18 +78,68 @@ def image(name, state, width=None, height=None, content_gen=None, drag_tag=None,
         return child_event
 
 
+def _value_range(image):
+    if image is None:
+        return 0, 1
+    image = np.asarray(image)
+    low, high = float(np.nanmin(image)), float(np.nanmax(image))
+    return low, high if high > low else low + 1
+
+
+def _colormap_lut(colormap, size=256):
+    """ Convert a colormap into a `numpy.uint8` RGBA array of shape `(n, 4)`. """
+    if isinstance(colormap, str):
+        if colormap in ['gray', 'grey']:
+            colormap = np.repeat(np.linspace(0, 1, size)[:, None], 3, axis=1)
+        else:
+            import matplotlib
+            colormap = matplotlib.colormaps[colormap]
+    if callable(colormap):
+        colormap = colormap(np.linspace(0, 1, size))
+    lut = np.asarray(colormap)
+    assert len(lut.shape) == 2 and lut.shape[1] in [3, 4], "Colormap must have the shape (n, 3) or (n, 4)."
+    if lut.dtype != np.uint8:
+        lut = np.round(np.clip(lut, 0, 1) * 255).astype('u1')
+    if lut.shape[1] == 3:
+        lut = np.concatenate([lut, np.full((len(lut), 1), 255, 'u1')], axis=1)
+    return lut
+
+
+def _sampled_scale(upload_dtype):
+    """ Factor by which values of a texture uploaded as `upload_dtype` are divided when sampled. """
+    # Integer textures are normalized into [0, 1], float textures are not
+    return dict(u1=255, u2=65535, f4=1)[upload_dtype]
+
+
 class Image(object):
     """ Image state containing pan and zoom information, and texture data. """
-    def __init__(self, image=None):
+    def __init__(self, image=None, levels=None, colormap=None):
         """ `image ` must be something convertible to `numpy.array`: greyscale, RGB, or RGBA.
         Channel is in the last dimension.
+
+        If `levels` is a `(low, high)` pair, the image is uploaded in its native format (8-bit, 16-bit, or
+        32-bit float, which other integer types are converted to), and the range `[low, high]` is mapped to black-white on the GPU. It can be
+        changed by `set_levels` without uploading the image again. This is useful for scientific data.
+
+        If `colormap` is given, greyscale images are displayed in false color. The image is sampled through
+        a colormap texture on the GPU, so `set_colormap` and `set_levels` don't upload the image again.
+        If `levels` isn't specified with `colormap`, the image value range is used. See `set_colormap`
+        for the supported colormap formats.
         """
         # TODO: remove this hack with last_{w,h}; create a more principled way of changing content size
         self.last_w, self.last_h = None, None
-        self.tex_id = None
-        self.garbage_tex_id = None
+        self.tex_id, self.tex_shape = None, None
+        self.garbage_tex_id, self.garbage_tex_shape = None, None
         self.pan_zoom = PanZoom((0, 0), (1, 1))
         self.tex_uv_b = 1, 1
+        self.stream = None
+        if colormap is not None and levels is None:
+            levels = _value_range(image)
+        self.levels = levels
+        self.raw_tex_id, self.raw_tex_data = None, None
+        self.lut_tex_id, self.lut_size = None, None
+        if colormap is not None:
+            self._upload_lut(colormap)
         self.change_image(image)
 
     def change_image(self, image):
@@ -101,19 +152,27 @@ class Image(object):
 
         * with dimensions divisible by four,
         * with type `numpy.uint8`,
-        * with three or four channels (RGB, RGBA),
+        * with one, three, or four channels (greyscale, RGB, RGBA),
         * in C order.
 
         Otherwise, the array will be copied & converted.
+
+        If the image has the same shape as the one before the previous call, its texture is
+        updated in place instead of creating a new one.
+
+        With `levels`, `numpy.uint16` and floating-point images are uploaded without conversion. Other integer
+        images than `numpy.uint8` are uploaded as floats, so `levels` are in their units.
         """
-        from concur.integrations.opengl import texture, rm_texture
-        if self.garbage_tex_id is not None:
-            rm_texture(self.garbage_tex_id)
-            self.garbage_tex_id = None
-        self.garbage_tex_id = self.tex_id  # Hold onto the old texture ID for (at least) one frame
+        from concur.integrations.opengl import texture, rm_texture, update_texture
+        if self.stream is not None:
+            # Pending uploads would overwrite the new image
+            self.stream.delete()
+            self.stream = None
+
         if image is None:
-            self.tex_id = texture(np.zeros((1, 1, 3)))
-            self.tex_w, self.tex_h = 1, 1
+            tex_image = np.zeros((1, 1, 3))
+            w, h = 1, 1
+            self.tex_uv_b = 1, 1
         else:
             if not isinstance(image, np.ndarray):
                 image = np.array(image)  # support PyTorch tensors and PIL images
@@ -123,19 +182,123 @@ class Image(object):
             if w % 4 or h % 4:
                 # Expand weirdly shaped images
                 nw, nh = w + (-w) % 4, h + (-h) % 4
-                new_image = np.ones((nh, nw, image.shape[2]) if len(image.shape) == 3 else (nh, nw)) * 255
-                new_image[:h, :w] = image
-                self.tex_id = texture(new_image)
+                tex_image = np.zeros((nh, nw) + image.shape[2:], image.dtype)
+                tex_image[:h, :w] = image
                 self.tex_uv_b = w / nw, h / nh
             else:
-                self.tex_id = texture(image)
+                tex_image = image
                 self.tex_uv_b = 1, 1
 
-            self.tex_w, self.tex_h = w, h
+        # The old texture may still be drawn in the current frame, so hold onto it for (at least) one frame.
+        # The texture from the previous call isn't used anymore, and it is overwritten if it has the right shape.
+        # With levels, the displayed texture is rendered from the raw one on the GPU.
+        old_tex_id, old_tex_shape = self.tex_id, self.tex_shape
+        tex_shape = tex_image.shape if self.levels is None else tex_image.shape[:2] + (4,)
+        if self.garbage_tex_id is not None and self.garbage_tex_shape == tex_shape:
+            self.tex_id = self.garbage_tex_id
+            if self.levels is None:
+                update_texture(self.tex_id, tex_image)
+        else:
+            if self.garbage_tex_id is not None:
+                rm_texture(self.garbage_tex_id)
+            self.tex_id = texture(tex_image if self.levels is None else np.zeros(tex_shape, 'u1'))
+        self.tex_shape = tex_shape
+        self.garbage_tex_id, self.garbage_tex_shape = old_tex_id, old_tex_shape
+
+        if self.levels is not None:
+            self._upload_raw(tex_image)
+
+        self.tex_w, self.tex_h = w, h
+        if image is not None and (self.last_w != self.tex_w or self.last_h != self.tex_h):
+            self.last_w, self.last_h = self.tex_w, self.tex_h
+            self.pan_zoom.reset_view((0,0), (self.tex_w, self.tex_h))
+
+    def _upload_raw(self, tex_image):
+        from concur.integrations.opengl import texture, rm_texture, update_texture, _upload_dtype
+        # The raw texture is never drawn directly, so it can be replaced right away.
+        data = tex_image.shape, _upload_dtype(tex_image.dtype, native=True)
+        if self.raw_tex_id is not None and self.raw_tex_data == data:
+            update_texture(self.raw_tex_id, tex_image, native=True)
+        else:
+            if self.raw_tex_id is not None:
+                rm_texture(self.raw_tex_id)
+            self.raw_tex_id = texture(tex_image, native=True)
+        self.raw_tex_data = data
+        self._render_levels()
+
+    def _render_levels(self):
+        from concur.integrations.opengl import window_level, colormap
+        low, high = self.levels
+        shape, dtype = self.raw_tex_data
+        scale = _sampled_scale(dtype)
+        if self.lut_tex_id is None:
+            window_level(self.raw_tex_id, self.tex_id, shape[1], shape[0], low / scale, high / scale)
+        else:
+            colormap(self.raw_tex_id, self.lut_tex_id, self.lut_size, self.tex_id, shape[1], shape[0],
+                     low / scale, high / scale)
+
+    def _upload_lut(self, colormap):
+        from concur.integrations.opengl import texture, rm_texture
+        lut = _colormap_lut(colormap)
+        if self.lut_tex_id is not None:
+            rm_texture(self.lut_tex_id)
+        self.lut_tex_id, self.lut_size = texture(lut[None]), len(lut)
+
+    def set_colormap(self, colormap):
+        """ Change the colormap without uploading the image again.
+
+        The image must have been created with a `colormap`. Colormaps are applied to the first channel.
+
+        Args:
+            colormap: Array of shape `(n, 3)` or `(n, 4)` with RGB(A) colors, either `numpy.uint8`,
+                or floats in the range [0, 1]. Alternatively, a function mapping an array of values in
+                [0, 1] into such colors, such as a Matplotlib colormap, or the name of a Matplotlib
+                colormap. `"gray"` is available even without Matplotlib.
+        """
+        assert self.lut_tex_id is not None, "Colormap can only be changed if the Image was created with `colormap`."
+        self._upload_lut(colormap)
+        self._render_levels()
+
+    def set_levels(self, low, high):
+        """ Change the range of values which is mapped to black-white, without uploading the image again.
+
+        The image must have been created with `levels`. For interactive control, the levels can be
+        edited by `concur.widgets.drag_float2`, for example.
+        """
+        assert self.levels is not None, "Levels can only be changed if the Image was created with `levels`."
+        self.levels = low, high
+        self._render_levels()
+
+    def stream_image(self, image, executor=None):
+        """ Change the image asynchronously, using `concur.integrations.opengl.TextureStream`.
+
+        The image is copied into a pixel buffer, and it is displayed in one of the following frames,
+        once the GPU has received it. Overlays are therefore not synchronized with the image.
+        This is useful for displaying video streams, where `change_image` would stall rendering.
+
+        Only images with the same shape as the current one and with dimensions divisible by four
+        are streamed. Other images fall back to `change_image`, as does the first call, and any call
+        if the Image uses `levels`.
+        If the GPU can't keep up, images are dropped.
+
+        Args:
+            image: Image in the same format as in `change_image`.
+            executor: Optional `concurrent.futures.Executor` which copies the image data. If `None`,
+                the image is copied on the calling thread.
+        """
+        from concur.integrations.opengl import TextureStream
+        if not isinstance(image, np.ndarray):
+            image = np.array(image)
+        if self.stream is not None and self.stream.tex_id == self.tex_id and image.shape == self.tex_shape:
+            self.stream.upload(image)
+        else:
+            self.change_image(image)
+            if image.shape == self.tex_shape and self.levels is None:
+                self.stream = TextureStream(self.tex_id, self.tex_shape, executor=executor)
 
-            if self.last_w != self.tex_w or self.last_h != self.tex_h:
-                self.last_w, self.last_h = self.tex_w, self.tex_h
-                self.pan_zoom.reset_view((0,0), (self.tex_w, self.tex_h))
+    def _commit_stream(self):
+        if self.stream is not None:
+            self.stream.commit()
 
     def reset_view(self):
         """ Reset view so that the whole image fits into the widget. """
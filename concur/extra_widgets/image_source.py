@@ -0,0 +1,202 @@
+""" Image sources which read image regions on demand.
+
+Sources are meant to be displayed by `concur.extra_widgets.tiled_image.tiled_image`, which reads only
+the visible tiles, so that multi-GB files open instantly:
+
+```python
+im = c.TiledImage(c.PILSource("slide.tif"))
+```
+
+Sources are indexed like NumPy arrays, with the same step in both axes: `source[y0:y1:step, x0:x1:step]`.
+Regions can be also passed to `concur.extra_widgets.image.Image.change_image`.
+
+Sources are read-only, and `copy.deepcopy` returns them unchanged, so that copies of widget states share them
+instead of reading the whole image into memory.
+"""
+
+
+import abc
+import numpy as np
+
+
+def raw_source(path, shape, dtype='u1', offset=0):
+    """ Memory-mapped image source for raw binary files.
+
+    Args:
+        path: File path.
+        shape: Image shape, `(height, width)` or `(height, width, channels)`.
+        dtype: NumPy data type of the pixels.
+        offset: Header size in bytes, which is skipped.
+
+    Returns:
+        A read-only `numpy.memmap`, which reads the file from disk only when it is indexed.
+    """
+    return _SharedMemmap(path, dtype=dtype, mode='r', offset=offset, shape=tuple(shape))
+
+
+class _SharedMemmap(np.memmap):
+    """ Read-only memory map, which isn't copied by `copy.deepcopy`. """
+    def __deepcopy__(self, memo):
+        return self
+
+
+class ImageSource(abc.ABC):
+    """ Base class for lazily read images.
+
+    Subclasses implement the abstract `read` method, and set the `shape` and `dtype` attributes.
+    """
+    shape = None
+    dtype = None
+
+    @abc.abstractmethod
+    def read(self, x, y, w, h, step=1):
+        """ Read a region as a NumPy array, taking every `step`-th pixel in both axes. """
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getitem__(self, index):
+        ys, xs = index
+        y0, y1, y_step = ys.indices(self.shape[0])
+        x0, x1, x_step = xs.indices(self.shape[1])
+        if x_step != y_step or x_step < 1:
+            raise IndexError("Image sources only support equal positive steps in both axes.")
+        return self.read(x0, y0, max(0, x1 - x0), max(0, y1 - y0), x_step)
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.read(0, 0, self.shape[1], self.shape[0])
+        return arr if dtype is None else arr.astype(dtype)
+
+
+# Pillow raw modes which can be memory-mapped, and their data type and channel count
+_raw_modes = {
+    'L': ('u1', 1),
+    'RGB': ('u1', 3),
+    'RGBA': ('u1', 4),
+    'I;16': ('<u2', 1),
+    'I;16B': ('>u2', 1),
+    'F;32F': ('<f4', 1),
+    'F;32BF': ('>f4', 1),
+}
+
+# Pillow image modes which are converted to NumPy arrays directly
+_modes = {
+    'L': ('u1', 1),
+    'RGB': ('u1', 3),
+    'RGBA': ('u1', 4),
+    'I;16': ('<u2', 1),
+    'I': ('<i4', 1),
+    'F': ('<f4', 1),
+}
+
+
+class PILSource(ImageSource):
+    """ Image file opened by Pillow, and decoded lazily.
+
+    Opening the file only reads its header. Uncompressed images, such as raw TIFF files, are memory-mapped,
+    so only the regions which are read are loaded from disk. This includes TIFF files stored in strips or tiles,
+    of which only the ones intersecting the region are read. Other formats, and compressed TIFF files,
+    are decoded in full on the first read.
+    JPEG files are decoded at a reduced resolution when only downsampled regions are requested.
+
+    Images with modes other than L, RGB, RGBA, and the 16-bit and 32-bit greyscale modes are converted
+    to RGB, or RGBA if they have transparency.
+    """
+    def __init__(self, path):
+        from PIL import Image
+        self.path = path
+        with Image.open(path) as im:
+            w, h = im.size
+            if im.mode in _modes:
+                self.mode = im.mode
+            else:
+                self.mode = 'RGBA' if 'A' in im.mode or 'transparency' in im.info else 'RGB'
+            self.mmap = self._memmap(im)
+        dtype, channels = _modes[self.mode]
+        self.dtype = np.dtype(dtype)
+        self.shape = (h, w) if channels == 1 else (h, w, channels)
+        self.decoded = {}  # Requested downsampling factor -> (array, actual downsampling factor)
+
+    def _memmap(self, im):
+        if not im.tile or any(tile[0] != 'raw' for tile in im.tile):
+            return None
+        args = [tile[3] if isinstance(tile[3], tuple) else (tile[3],) for tile in im.tile]
+        if any(a[0] != args[0][0] for a in args) or args[0][0] not in _raw_modes \
+                or _raw_modes[args[0][0]][0] != _modes.get(im.mode, (None,))[0]:
+            return None
+        dtype, channels = _raw_modes[args[0][0]]
+        w, h = im.size
+        shape = (h, w) if channels == 1 else (h, w, channels)
+        if len(im.tile) > 1:
+            if any(len(a) > 2 and a[2] != 1 for a in args):
+                return None
+            return _RawTiles(self.path, im.tile, dtype, shape)
+        _, box, offset, _ = im.tile[0]
+        args = args[0]
+        if tuple(box) != (0, 0) + im.size:
+            return None
+        stride = args[1] if len(args) > 1 else 0
+        if stride not in (0, w * channels * np.dtype(dtype).itemsize):
+            return None
+        arr = np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        if len(args) > 2 and args[2] == -1:
+            arr = arr[::-1]  # Bottom-up row order
+        return arr
+
+    def _decode(self, step):
+        from PIL import Image
+        if 1 in self.decoded:
+            return self.decoded[1]
+        # JPEG can be decoded directly at 1/2, 1/4, or 1/8 of the resolution
+        scale = max(s for s in (1, 2, 4, 8) if step % s == 0)
+        if scale not in self.decoded:
+            with Image.open(self.path) as im:
+                if scale > 1:
+                    im.draft(im.mode, (-(-self.shape[1] // scale), -(-self.shape[0] // scale)))
+                if im.mode != self.mode:
+                    im = im.convert(self.mode)
+                arr = np.asarray(im)
+            actual_scale = int(round(self.shape[1] / arr.shape[1]))
+            self.decoded[actual_scale if actual_scale == 1 else scale] = arr, actual_scale
+            if actual_scale == 1:
+                return self.decoded[1]
+        return self.decoded[scale]
+
+    def read(self, x, y, w, h, step=1):
+        if self.mmap is not None:
+            return np.asarray(self.mmap[y:y + h:step, x:x + w:step])
+        arr, scale = self._decode(step)
+        return arr[y // scale:-(-(y + h) // scale):step // scale, x // scale:-(-(x + w) // scale):step // scale]
+
+
+class _RawTiles(ImageSource):
+    """ Uncompressed image stored in strips or tiles, which are memory-mapped separately.
+
+    `tiles` are Pillow tile descriptors: `(decoder, box, offset, (raw mode, stride, orientation))`.
+    """
+    def __init__(self, path, tiles, dtype, shape):
+        self.dtype = np.dtype(dtype)
+        self.shape = shape
+        self.file = np.memmap(path, dtype='u1', mode='r')
+        self.boxes = np.array([tile[1] for tile in tiles])
+        self.offsets = [tile[2] for tile in tiles]
+        self.strides = [tile[3][1] if len(tile[3]) > 1 else 0 for tile in tiles]
+
+    def _tile(self, i):
+        x0, y0, x1, y1 = self.boxes[i]
+        pixel = self.dtype.itemsize * (self.shape[2] if len(self.shape) > 2 else 1)
+        stride = self.strides[i] or (x1 - x0) * pixel
+        rows = self.file[self.offsets[i]:self.offsets[i] + (y1 - y0) * stride].reshape(y1 - y0, stride)
+        return rows[:, :(x1 - x0) * pixel].view(self.dtype).reshape((y1 - y0, x1 - x0) + self.shape[2:])
+
+    def read(self, x, y, w, h, step=1):
+        out = np.empty((-(-h // step), -(-w // step)) + self.shape[2:], self.dtype)
+        x0, y0, x1, y1 = self.boxes.T
+        for i in np.flatnonzero((x0 < x + w) & (x1 > x) & (y0 < y + h) & (y1 > y)):
+            # First sampled pixel inside the tile
+            tx = x + -(-(max(x0[i], x) - x) // step) * step
+            ty = y + -(-(max(y0[i], y) - y) // step) * step
+            part = self._tile(i)[ty - y0[i]:min(y1[i], y + h) - y0[i]:step, tx - x0[i]:min(x1[i], x + w) - x0[i]:step]
+            r, c = (ty - y) // step, (tx - x) // step
+            out[r:r + part.shape[0], c:c + part.shape[1]] = part
+        return out
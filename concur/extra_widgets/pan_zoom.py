@@ -13,6 +13,7 @@ import imgui
 from concur.widgets import child, invisible_button
 from concur.core import multi_orr, orr, forever, listen, optional, map as cmap
 from concur.extra_widgets.draggable import draggable
+import concur.profiler as _profiler
 
 
 def pan_zoom(name, state, width=None, height=None, content_gen=None, drag_tag=None, down_tag=None, hover_tag=None):
@@ -178,7 +179,7 @@ def pan_zoom(name, state, width=None, height=None, content_gen=None, drag_tag=No
                 tf = new_tf
                 w, h = tf.view_s[2] - tf.view_s[0], tf.view_s[3] - tf.view_s[1]
                 content = content_gen(tf=tf, event_gen=lambda: listen(event_queue))
-            next(content)
+            _profiler.resume("Pan-zoom", content)
         except StopIteration as e:
             content_value = e.value
             content_returned = True
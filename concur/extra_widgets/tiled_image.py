@@ -0,0 +1,234 @@
+""" Image widget for images too large for a single texture, such as whole-slide or satellite images.
+
+The image is split into square tiles at several pyramid levels. Only the tiles which are visible
+at the current zoom level are uploaded to the GPU, and they are kept in a LRU cache.
+
+Pixels of the coarser levels are box-filtered. Each one is the mean of up to 4x4 evenly spaced samples
+of the block of the image it covers, so that reading a tile costs the same at every level.
+"""
+
+
+import copy
+from collections import OrderedDict
+
+import numpy as np
+import imgui
+from concur.extra_widgets.pan_zoom import PanZoom, pan_zoom
+from concur.core import orr, optional
+
+
+_TAPS = 4  # Maximum number of samples per axis averaged into each pixel of the coarser levels
+
+def tiled_image(name, state, width=None, height=None, content_gen=None, drag_tag=None, down_tag=None, hover_tag=None):
+    """ The tiled image widget.
+
+    It is used in the same way as `concur.extra_widgets.image.image`, with the difference that
+    `state` is an instance of `concur.extra_widgets.tiled_image.TiledImage`.
+
+    Tiles which are not uploaded yet are temporarily drawn from the coarser pyramid levels.
+    """
+    def content_gen_with_tiles(tf, event_gen=None):
+        if drag_tag or down_tag or hover_tag:
+            kwargs = dict(tf=tf, event_gen=event_gen)
+        else:
+            kwargs = dict(tf=tf)
+        return orr([
+            _tiles(state, tf),
+            optional(content_gen is not None, content_gen, **kwargs),
+        ])
+
+    _, (st, child_event) = yield from pan_zoom(
+        name, state.pan_zoom, width, height,
+        content_gen=content_gen_with_tiles,
+        drag_tag=drag_tag, down_tag=down_tag, hover_tag=hover_tag)
+    if st is not None:
+        new_state = copy.deepcopy(state)
+        new_state.pan_zoom = st
+        return name, new_state
+    else:
+        return child_event
+
+
+def _tiles(state, tf):
+    """ Draw the visible tiles of `state`, uploading the missing ones over the following frames. """
+    level = state.level(tf)
+    keys = state.visible_tiles(tf, level)
+    draw_list = imgui.get_window_draw_list()
+    while True:
+        state.cache.new_frame()
+        for key in keys:
+            tex_id, uv_a, uv_b = state.tile_texture(key)
+            if tex_id is not None:
+                x, y, w, h = state.tile_rect(key)
+                p1, p2 = tf.transform(np.array([[x, y], [x + w, y + h]]))
+                draw_list.add_image(tex_id, tuple(p1), tuple(p2), uv_a, uv_b)
+        yield
+
+
+class _TileCache(object):
+    """ LRU cache of tile textures, shared between all copies of a `TiledImage`. """
+    def __init__(self, size, max_uploads):
+        self.size = size
+        self.max_uploads = max_uploads
+        self.tiles = OrderedDict()  # key -> (tex_id, uv_b, time of the last use)
+        self.time = None
+        self.uploads = 0
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def new_frame(self):
+        time = imgui.get_time()
+        if time != self.time:
+            self.time = time
+            self.uploads = 0
+
+    def get(self, key):
+        if key not in self.tiles:
+            return None
+        tex_id, uv_b, _ = self.tiles[key]
+        self.tiles[key] = tex_id, uv_b, self.time
+        self.tiles.move_to_end(key)
+        return tex_id, uv_b
+
+    def can_upload(self):
+        return self.uploads < self.max_uploads
+
+    def put(self, key, tex_id, uv_b):
+        from concur.integrations.opengl import rm_texture
+        self.uploads += 1
+        self.tiles[key] = tex_id, uv_b, self.time
+        # Textures used in the current frame are still needed for rendering, so they are never evicted.
+        while len(self.tiles) > self.size:
+            old_key = next(iter(self.tiles))
+            old_tex_id, _, old_time = self.tiles[old_key]
+            if old_time == self.time:
+                break
+            del self.tiles[old_key]
+            rm_texture(old_tex_id)
+
+    def clear(self):
+        from concur.integrations.opengl import rm_textures
+        rm_textures([tex_id for tex_id, _, _ in self.tiles.values()])
+        self.tiles.clear()
+
+
+class TiledImage(object):
+    """ Tiled image state containing pan and zoom information, and a cache of tile textures. """
+    def __init__(self, image, tile_size=512, cache_size=256, max_uploads=4):
+        """
+        Args:
+            image: NumPy array, or any array-like object which supports strided slicing and has a `shape`
+                attribute, such as `numpy.memmap` or `concur.extra_widgets.image_source.PILSource`.
+                The image may be greyscale, RGB, or RGBA, with channel in the last dimension.
+                It is only read one tile at a time, when the tile becomes visible.
+            tile_size: Size of the square tiles in pixels. It must be divisible by four.
+            cache_size: Maximum number of tile textures kept on the GPU. It may be exceeded temporarily
+                if more tiles are visible at once.
+            max_uploads: Maximum number of tiles uploaded in one frame. The rest is uploaded in the
+                following frames, so that zooming and panning don't stall.
+        """
+        assert tile_size % 4 == 0, "Tile size must be divisible by four."
+        assert len(image.shape) in [2, 3]
+        self.source = image
+        self.tile_size = tile_size
+        self.h, self.w = image.shape[:2]
+        # Level `n` is downsampled by a factor of `2 ** n`. The top level fits into a single tile.
+        self.n_levels = 1
+        while max(self.w, self.h) > tile_size << (self.n_levels - 1):
+            self.n_levels += 1
+        self.cache = _TileCache(cache_size, max_uploads)
+        self.pan_zoom = PanZoom((0, 0), (self.w, self.h))
+
+    def __deepcopy__(self, memo):
+        # Widgets copy the state on each pan and zoom. The source and the tiles are shared by the copies.
+        state = copy.copy(self)
+        state.pan_zoom = copy.deepcopy(self.pan_zoom, memo)
+        return state
+
+    def level(self, tf):
+        """ Pyramid level with the finest resolution which is not finer than the screen. """
+        zoom = abs(tf.c2s[0, 0])
+        if zoom >= 1:
+            return 0
+        return int(min(np.floor(np.log2(1 / zoom)), self.n_levels - 1))
+
+    def tile_rect(self, key):
+        """ Tile rectangle `(x, y, width, height)` in image coordinates. """
+        level, ty, tx = key
+        span = self.tile_size << level
+        x, y = tx * span, ty * span
+        return x, y, min(span, self.w - x), min(span, self.h - y)
+
+    def visible_tiles(self, tf, level):
+        """ Keys `(level, ty, tx)` of the tiles at a given level which intersect `tf.view_c`. """
+        span = self.tile_size << level
+        left, top, right, bottom = tf.view_c
+        tx0, tx1 = max(0, int(left // span)), min(-(-self.w // span), int(right // span) + 1)
+        ty0, ty1 = max(0, int(top // span)), min(-(-self.h // span), int(bottom // span) + 1)
+        return [(level, ty, tx) for ty in range(ty0, ty1) for tx in range(tx0, tx1)]
+
+    def tile_texture(self, key):
+        """ Texture of a tile as `(tex_id, uv_a, uv_b)`, uploading it if the per-frame budget allows.
+
+        If the tile isn't available, the corresponding part of the nearest cached coarser tile is returned.
+        If there is no such tile, `tex_id` is `None`.
+        """
+        tile = self.cache.get(key)
+        if tile is None and self.cache.can_upload():
+            tile = self._upload(key)
+        if tile is not None:
+            return tile[0], (0, 0), tile[1]
+
+        level, ty, tx = key
+        x, y, w, h = self.tile_rect(key)
+        for parent_level in range(level + 1, self.n_levels):
+            shift = parent_level - level
+            parent_key = parent_level, ty >> shift, tx >> shift
+            parent = self.cache.get(parent_key)
+            if parent is not None:
+                tex_id, (u, v) = parent
+                px, py, pw, ph = self.tile_rect(parent_key)
+                uv_a = (x - px) / pw * u, (y - py) / ph * v
+                uv_b = (x + w - px) / pw * u, (y + h - py) / ph * v
+                return tex_id, uv_a, uv_b
+        return None, None, None
+
+    def _tile_data(self, key):
+        """ Read the pixels of a tile, box-filtered to the resolution of its level. """
+        level, _, _ = key
+        taps = min(1 << level, _TAPS)
+        sub = (1 << level) // taps
+        x, y, w, h = self.tile_rect(key)
+        data = np.asarray(self.source[y:y + h:sub, x:x + w:sub])
+        if taps == 1:
+            return data
+        rows, cols = np.arange(0, data.shape[0], taps), np.arange(0, data.shape[1], taps)
+        sums = np.add.reduceat(np.add.reduceat(data.astype(np.float64), rows, axis=0), cols, axis=1)
+        # Blocks at the bottom and right edges of the image may be smaller
+        counts = np.outer(np.diff(np.append(rows, data.shape[0])), np.diff(np.append(cols, data.shape[1])))
+        mean = sums / counts.reshape(counts.shape + (1,) * (data.ndim - 2))
+        return np.rint(mean).astype(data.dtype) if data.dtype.kind in 'iub' else mean.astype(data.dtype)
+
+    def _upload(self, key):
+        from concur.integrations.opengl import texture
+        data = self._tile_data(key)
+        th, tw = data.shape[:2]
+        # Texture dimensions must be divisible by four, so pad the edge tiles
+        nw, nh = tw + (-tw) % 4, th + (-th) % 4
+        if (nw, nh) != (tw, th):
+            padded = np.zeros((nh, nw) + data.shape[2:], data.dtype)
+            padded[:th, :tw] = data
+            data = padded
+        uv_b = tw / nw, th / nh
+        tex_id = texture(data)
+        self.cache.put(key, tex_id, uv_b)
+        return tex_id, uv_b
+
+    def release(self):
+        """ Delete all the tile textures. They are re-uploaded when needed. """
+        self.cache.clear()
+
+    def reset_view(self):
+        """ Reset view so that the whole image fits into the widget. """
+        return self.pan_zoom.reset_view()
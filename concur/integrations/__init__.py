@@ -8,6 +8,7 @@ a couple of lines of code.
 import concur.integrations.glfw
 import concur.integrations.opengl
 import concur.integrations.puppet
+import concur.integrations.null
 
 from .glfw import *
 from .opengl import *
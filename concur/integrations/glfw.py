@@ -1,6 +1,7 @@
 """Main integration back-end."""
 
 
+import asyncio
 import glfw
 import OpenGL.GL as gl
 import time
@@ -8,6 +9,9 @@ import time
 import imgui
 from imgui.integrations.glfw import GlfwRenderer
 
+import concur.core
+import concur.profiler as _profiler
+
 from concur.integrations.opengl import create_offscreen_fb, get_fb_data
 
 
@@ -72,8 +76,13 @@ def create_window(window_name, width, height, visible=True, maximized=False):
 
 
 def begin_maximized_window(name, glfw_window, menu_bar=False):
+    _begin_window_of_size(name, glfw.get_window_size(glfw_window), menu_bar)
+
+
+def _begin_window_of_size(name, size, menu_bar=False):
+    """ Begin a window without decorations covering the area from the origin to `size`. """
     imgui.set_next_window_position(0, 0)
-    imgui.set_next_window_size(*glfw.get_window_size(glfw_window))
+    imgui.set_next_window_size(*size)
     imgui.push_style_var(imgui.STYLE_WINDOW_ROUNDING, 0)
     imgui.push_style_var(imgui.STYLE_WINDOW_BORDERSIZE, 0)
     window_flags = imgui.WINDOW_NO_TITLE_BAR | imgui.WINDOW_NO_COLLAPSE | \
@@ -95,13 +104,36 @@ def create_window_dock(glfw_window, menu_bar=False):
     imgui.end()
 
 
+# Number of frames drawn after an event in the idle mode, so that ImGui and the widgets can settle
+_IDLE_SETTLE_FRAMES = 3
+
+
+def _invalidate_on_events(window):
+    """ Chain GLFW input callbacks, so that any input requests a redraw in the idle mode. """
+    def chained(previous):
+        def callback(*args):
+            concur.core._redraw_requested.set()
+            if previous is not None:
+                previous(*args)
+        return callback
+
+    for set_callback in [
+            glfw.set_key_callback, glfw.set_char_callback, glfw.set_cursor_pos_callback,
+            glfw.set_cursor_enter_callback, glfw.set_mouse_button_callback, glfw.set_scroll_callback,
+            glfw.set_window_size_callback, glfw.set_framebuffer_size_callback,
+            glfw.set_window_focus_callback, glfw.set_window_refresh_callback]:
+        previous = set_callback(window, None)
+        set_callback(window, chained(previous))
+
+
 def main(
         widget, name="Concur", width=640, height=480,
         fps=60, save_screencast=None, screencast_fps=60,
-        menu_bar=False, maximized=False):
+        menu_bar=False, maximized=False, idle=False, idle_timeout=1.0):
     """ Create a GLFW window, spin up the main loop, and display a given widget inside.
 
     To create a maximized window, pass width and height larger than the screen.
+    Counters of the geometry drawn in each frame are returned by `concur.profiler.draw_stats`.
 
     Args:
         widget: The widget to display inside the window. When the widget returns, the application exits.
@@ -114,6 +146,70 @@ def main(
         screencast_fps: Save the screencast video with a given FPS.
         menu_bar: Reserve space for `concur.widgets.main_menu_bar` at the top of the window.
         maximized: Create a maximized window.
+        idle: Draw frames only in response to user input, or when `concur.core.invalidate` is called,
+            instead of drawing continuously. This reduces CPU and GPU usage of idle applications
+            to nearly zero. Widgets which change without user input must call `concur.core.invalidate`:
+            `concur.core.Block` and `concur.core.Queue` do this automatically, animations must do it
+            in each frame.
+        idle_timeout: Maximum time in seconds between frames in the idle mode, or `None` to wait indefinitely.
+            When it elapses without any input, only a single frame is drawn.
+    """
+    loop = _main_loop(
+        widget, name, width, height, fps, save_screencast, screencast_fps,
+        menu_bar, maximized, idle, glfw.post_empty_event)
+    try:
+        for wait, seconds in loop:
+            if wait == 'sleep':
+                if seconds > 0:
+                    time.sleep(seconds)
+            elif idle_timeout is None:
+                glfw.wait_events()
+            else:
+                glfw.wait_events_timeout(idle_timeout)
+    finally:
+        loop.close()
+
+
+async def main_async(
+        widget, name="Concur", width=640, height=480,
+        fps=60, save_screencast=None, screencast_fps=60,
+        menu_bar=False, maximized=False, idle=False, idle_timeout=1.0):
+    """ Variant of `main`, which runs the main loop as a coroutine in the asyncio event loop.
+
+    Widgets can then wait on awaitables using `concur.core.task`, without any threads:
+
+    ```python
+    asyncio.run(c.main_async(app()))
+    ```
+
+    Arguments are the same as in `main`. In the idle mode, GLFW events are polled at the `fps` rate
+    without drawing frames, because waiting for them would block the event loop.
+    """
+    loop = _main_loop(
+        widget, name, width, height, fps, save_screencast, screencast_fps,
+        menu_bar, maximized, idle, None)
+    try:
+        for wait, seconds in loop:
+            if wait == 'sleep':
+                # Sleep even if the frame took too long, so that other tasks can run
+                await asyncio.sleep(seconds)
+            else:
+                t0 = time.perf_counter()
+                while not concur.core._redraw_requested.is_set() \
+                        and (idle_timeout is None or time.perf_counter() - t0 < idle_timeout):
+                    await asyncio.sleep(1/fps)
+                    glfw.poll_events()
+    finally:
+        loop.close()
+
+
+def _main_loop(
+        widget, name, width, height, fps, save_screencast, screencast_fps,
+        menu_bar, maximized, idle, wake_handler):
+    """ Main loop generator, which draws frames and yields when it needs to wait.
+
+    It yields `('sleep', seconds)` to limit the frame rate, and `('wait', None)` in the idle mode when
+    there is nothing to draw. Then, the caller waits for user input, or `concur.core.invalidate`.
     """
     if imgui.get_current_context() is None:
         imgui.create_context()
@@ -138,10 +234,23 @@ def main(
         offscreen_fb = create_offscreen_fb(width, height)
         writer = imageio.get_writer(save_screencast, mode='I', fps=screencast_fps)
 
+    if idle:
+        _invalidate_on_events(window)
+        concur.core._wake_handler = wake_handler
+    settle_frames = _IDLE_SETTLE_FRAMES
+
     try:
         while not glfw.window_should_close(window):
+            if idle and settle_frames <= 0 and not concur.core._redraw_requested.is_set():
+                # Input and `invalidate` set `_redraw_requested`, which starts the settling again. After
+                # a timeout without them, a single frame is drawn.
+                yield 'wait', None
             t0 = time.perf_counter()
             glfw.poll_events()
+            if concur.core._redraw_requested.is_set():
+                concur.core._redraw_requested.clear()
+                settle_frames = _IDLE_SETTLE_FRAMES
+            settle_frames -= 1
             impl.process_inputs()
 
             imgui.new_frame()
@@ -150,10 +259,12 @@ def main(
             begin_maximized_window("Default##Concur", window, menu_bar=menu_bar)
 
             try:
-                next(widget)
+                _profiler.begin_frame()
+                _profiler.resume("Default##Concur", widget)
             except StopIteration:
                 break
             finally:
+                _profiler.end_frame()
                 imgui.end()
                 imgui.render()
 
@@ -168,12 +279,13 @@ def main(
                 gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
 
                 impl.render(imgui.get_draw_data())
+                _profiler.end_draw(imgui.get_draw_data())
                 glfw.swap_buffers(window)
 
             t1 = time.perf_counter()
-            if t1 - t0 < 1/fps:
-                time.sleep(1/fps - (t1 - t0))
+            yield 'sleep', max(0, 1/fps - (t1 - t0))
     finally:
+        concur.core._wake_handler = None
         impl.shutdown()
         imgui.destroy_context(imgui.get_current_context())
         glfw.terminate()
@@ -0,0 +1,116 @@
+"""Headless back-end, which runs ImGui and the widgets without any window or OpenGL context.
+
+ImGui produces its draw data as usual, but nothing is rendered. This is useful for testing widget logic,
+and for CPU benchmarks, on machines without a display. Input is simulated in the same way as in
+`concur.integrations.puppet`, so `concur.testing` works with both back-ends.
+
+Widgets which use OpenGL directly, such as `concur.extra_widgets.image.image`, don't work with this back-end.
+"""
+
+import ctypes
+import time
+
+import imgui
+import numpy as np
+
+import concur.profiler as _profiler
+from concur.integrations.glfw import _begin_window_of_size
+from concur.integrations.puppet import PuppetInput
+
+
+class NullRenderer(PuppetInput):
+    """ Renderer which doesn't render anything. User inputs are set programmatically.
+
+    Time advances by `delta_time` seconds in each frame, independently of the wall clock, so runs are reproducible.
+    """
+    def __init__(self, width, height, delta_time=1/60, capture_draw_data=False):
+        self.io = imgui.get_io()
+        self.io.display_size = width, height
+        self.io.delta_time = delta_time
+        self.io.ini_file_name = None  # Don't save window positions
+        # Build the font atlas. The texture ID is set so that draw commands can be inspected.
+        self.io.fonts.get_tex_data_as_rgba32()
+        self.io.fonts.texture_id = 0
+        self.capture_draw_data = capture_draw_data
+        self.draw_data = None
+        self._init_inputs()
+
+    def process_inputs(self):
+        """Process the virtual user inputs. Called by `main` at the beginning of each frame."""
+        self._process_virtual_inputs()
+
+    def render(self, draw_data):
+        """ Copy the draw data into `self.draw_data` if `capture_draw_data` is set. """
+        if self.capture_draw_data:
+            self.draw_data = copy_draw_data(draw_data)
+
+
+def copy_draw_data(draw_data):
+    """ Copy ImGui draw data, which is only valid until the next frame, into NumPy arrays.
+
+    Returns:
+        List of `(vtx, idx, commands)` tuples, one per command list. `vtx` is a structured array with fields
+        `pos`, `uv`, and `col`, `idx` is an array of vertex indices, and `commands` is a list of
+        `(texture_id, clip_rect, elem_count)` tuples.
+    """
+    from concur.draw import _draw_vert, _draw_idx
+    lists = []
+    for cmd_list in draw_data.commands_lists:
+        n_vtx, n_idx = cmd_list.vtx_buffer_size, cmd_list.idx_buffer_size
+        vtx = np.frombuffer((ctypes.c_char * (n_vtx * _draw_vert.itemsize)).from_address(cmd_list.vtx_buffer_data),
+                            _draw_vert).copy()
+        idx = np.frombuffer((ctypes.c_char * (n_idx * _draw_idx.itemsize)).from_address(cmd_list.idx_buffer_data),
+                            _draw_idx).copy()
+        commands = [(cmd.texture_id, tuple(cmd.clip_rect), cmd.elem_count) for cmd in cmd_list.commands]
+        lists.append((vtx, idx, commands))
+    return lists
+
+
+def main(widget_gen, width=640, height=480, fps=None, max_frames=None, capture_draw_data=False, delta_time=1/60):
+    """ Run the main loop with a given widget, without creating a window.
+
+    `widget_gen` takes as an argument a `NullRenderer` instance, and returns a widget. The loop runs until the widget
+    returns, or until `max_frames` frames are drawn.
+
+    Args:
+        fps: Limit the frame rate. If `None`, frames are drawn as fast as possible.
+        max_frames: Maximum number of frames, or `None` for no limit.
+        capture_draw_data: Copy the draw data of each frame into `NullRenderer.draw_data`.
+        delta_time: Time step between frames, as seen by ImGui.
+
+    Returns:
+        Draw data of the last frame, as returned by `copy_draw_data`, if `capture_draw_data` is set.
+    """
+    imgui.create_context()
+    try:
+        impl = NullRenderer(width, height, delta_time, capture_draw_data)
+        widget = widget_gen(impl)
+        frame = 0
+        while max_frames is None or frame < max_frames:
+            t0 = time.perf_counter()
+            _profiler.begin_phases()
+            impl.process_inputs()
+            imgui.new_frame()
+            _begin_window_of_size("Default##Concur", (width, height))
+            try:
+                _profiler.begin_frame()
+                _profiler.resume("Default##Concur", widget)
+            except StopIteration:
+                break
+            finally:
+                _profiler.end_frame()
+                imgui.end()
+                _profiler.end_phase()
+                imgui.render()
+                _profiler.end_phase()
+                impl.render(imgui.get_draw_data())
+                _profiler.end_draw(imgui.get_draw_data())
+                _profiler.end_phases()
+            frame += 1
+
+            t1 = time.perf_counter()
+            if fps is not None and t1 - t0 < 1/fps:
+                time.sleep(1/fps - (t1 - t0))
+    finally:
+        imgui.destroy_context(imgui.get_current_context())
+    return impl.draw_data
@@ -1,40 +1,333 @@
 """Raw OpenGL functions, mostly for creating and deleting textures."""
 
+import ctypes
 import numpy as np
 from PIL import Image
 from OpenGL.GL import *
 
+import concur.profiler as _profiler
+
 
 __pdoc__ = dict(create_offscreen_fb=False, get_fb_data=False)
 
 
-def texture(arr):
-    """ Create a new OpenGL texture and return its texture ID. """
-    if len(arr.shape) == 2:
-        arr = np.tile(np.expand_dims(arr, 2), (1, 1, 3))
+# Texture formats of native uploads, indexed by data type and channel count
+_native_formats = {
+    'u1': (GL_UNSIGNED_BYTE, {1: GL_R8, 3: GL_RGB8, 4: GL_RGBA8}),
+    'u2': (GL_UNSIGNED_SHORT, {1: GL_R16, 3: GL_RGB16, 4: GL_RGBA16}),
+    'f4': (GL_FLOAT, {1: GL_R32F, 3: GL_RGB32F, 4: GL_RGBA32F}),
+}
 
-    if len(arr.shape) == 3:
-        if arr.shape[2] == 4:
-            rgb_mode = GL_RGBA
-        elif arr.shape[2] == 3:
-            rgb_mode = GL_RGB
-        else:
-            raise ValueError(f"Only RGB or RGBA channels supported, instead found {arr.shape[2]} color channels.")
+_pixel_formats = {1: GL_RED, 3: GL_RGB, 4: GL_RGBA}
+
+
+def _upload_dtype(dtype, native=False):
+    """ Data type `'u1'`, `'u2'`, or `'f4'`, in which arrays of a given data type are uploaded. See `texture`. """
+    if native and dtype == np.uint16:
+        return 'u2'
+    elif native and dtype != np.uint8 and np.issubdtype(dtype, np.number):
+        return 'f4'
     else:
+        return 'u1'
+
+
+def _texture_data(arr, native=False):
+    """ Convert an array into a `(data, internal_format, format, type)` tuple suitable for texture upload.
+
+    Data is converted to `u1`, unless `native` is set. Then, 8-bit and 16-bit unsigned data is kept, and
+    floats and other integers are converted to `f4`, so that their values don't wrap around.
+    """
+    if len(arr.shape) == 2:
+        arr = np.expand_dims(arr, 2)
+    if len(arr.shape) != 3:
         raise ValueError(f"Shape rank has to be 2 or 3, but it is {len(arr.shape)}")
+    if arr.shape[2] not in _pixel_formats:
+        raise ValueError(f"Only greyscale, RGB or RGBA channels supported, instead found {arr.shape[2]} color channels.")
+
+    dtype = _upload_dtype(arr.dtype, native)
+    gl_type, internal_formats = _native_formats[dtype]
+    # If the array isn't normalized, glTexImage2D may leak reference count
+    return np.ascontiguousarray(arr, dtype), internal_formats[arr.shape[2]], _pixel_formats[arr.shape[2]], gl_type
+
+
+def texture(arr, native=False):
+    """ Create a new OpenGL texture and return its texture ID.
+
+    Greyscale arrays are uploaded as single-channel textures, which are displayed in grey.
+    Arrays are converted to `numpy.uint8`, unless `native` is `True`. Then, `numpy.uint16` arrays
+    are uploaded as 16-bit textures, and floating-point arrays, as well as signed and 32-bit or wider
+    integers, as 32-bit float textures. Their values are normalized into the range [0, 1] when they are
+    sampled, except for the floats.
+    """
+    arr, internal_format, pixel_format, gl_type = _texture_data(arr, native)
 
     texid = int(glGenTextures(1)) # Conversion from np.uint32 to int
     glBindTexture(GL_TEXTURE_2D, texid)
-    # If the array isn't normalized, glTexImage2D may leak reference count
-    glTexImage2D(GL_TEXTURE_2D, 0, rgb_mode, arr.shape[1], arr.shape[0],
-                 0, rgb_mode, GL_UNSIGNED_BYTE, np.ascontiguousarray(arr, 'u1'))
+    glTexImage2D(GL_TEXTURE_2D, 0, internal_format, arr.shape[1], arr.shape[0],
+                 0, pixel_format, gl_type, arr)
+    _profiler.count_gl(texture_binds=1, texture_uploads=1)
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    if pixel_format == GL_RED:
+        glTexParameteriv(GL_TEXTURE_2D, GL_TEXTURE_SWIZZLE_RGBA, [GL_RED, GL_RED, GL_RED, GL_ONE])
     return texid
 
 
+def update_texture(tex_id, arr, native=False):
+    """ Overwrite the contents of an existing texture without re-allocating it.
+
+    `arr` must have the same width, height, number of channels, and (if `native`) data type
+    as the array the texture was created from.
+    """
+    arr, _, pixel_format, gl_type = _texture_data(arr, native)
+    glBindTexture(GL_TEXTURE_2D, tex_id)
+    glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, arr.shape[1], arr.shape[0], pixel_format, gl_type, arr)
+    _profiler.count_gl(texture_binds=1, texture_uploads=1)
+
+
+_VERTEX_SHADER = """
+#version 330 core
+out vec2 uv;
+void main() {
+    // Single triangle covering the whole viewport
+    uv = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+    gl_Position = vec4(uv * 2.0 - 1.0, 0.0, 1.0);
+}
+"""
+
+_WINDOW_LEVEL_SHADER = """
+#version 330 core
+uniform sampler2D src;
+uniform float low;
+uniform float high;
+in vec2 uv;
+out vec4 color;
+void main() {
+    vec4 value = texture(src, uv);
+    color = vec4(clamp((value.rgb - low) / (high - low), 0.0, 1.0), value.a);
+}
+"""
+
+_COLORMAP_SHADER = """
+#version 330 core
+uniform sampler2D src;
+uniform sampler2D lut;
+uniform float lut_size;
+uniform float low;
+uniform float high;
+in vec2 uv;
+out vec4 color;
+void main() {
+    float t = clamp((texture(src, uv).r - low) / (high - low), 0.0, 1.0);
+    // Sample the centers of the first and the last LUT texels at the ends of the range
+    color = texture(lut, vec2((t * (lut_size - 1.0) + 0.5) / lut_size, 0.5));
+}
+"""
+
+
+def _shader(shader_type, source):
+    shader = glCreateShader(shader_type)
+    glShaderSource(shader, source)
+    glCompileShader(shader)
+    if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+        raise RuntimeError(f"Shader compilation failed: {glGetShaderInfoLog(shader)}")
+    return shader
+
+
+def _program(fragment_source):
+    """ Shader program drawing a full-viewport triangle with a given fragment shader, cached per context. """
+    from OpenGL import contextdata
+    programs = contextdata.getValue('concur_programs')
+    if programs is None:
+        programs = {}
+        contextdata.setValue('concur_programs', programs)
+    if fragment_source not in programs:
+        vertex = _shader(GL_VERTEX_SHADER, _VERTEX_SHADER)
+        fragment = _shader(GL_FRAGMENT_SHADER, fragment_source)
+        program = glCreateProgram()
+        glAttachShader(program, vertex)
+        glAttachShader(program, fragment)
+        glLinkProgram(program)
+        glDeleteShader(vertex)
+        glDeleteShader(fragment)
+        if not glGetProgramiv(program, GL_LINK_STATUS):
+            raise RuntimeError(f"Shader linking failed: {glGetProgramInfoLog(program)}")
+        # Core profile requires a bound vertex array, even though there are no vertex attributes
+        programs[fragment_source] = program, int(glGenVertexArrays(1))
+    return programs[fragment_source]
+
+
+def _render_pass(fragment_source, dst_tex_id, width, height, textures, uniforms):
+    """ Render into `dst_tex_id` using a fragment shader, with `textures` bound to consecutive texture units.
+
+    The OpenGL state touched by the pass is restored afterwards, so it may be run while building a frame.
+    """
+    program, vao = _program(fragment_source)
+    prev_fb = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+    prev_viewport = glGetIntegerv(GL_VIEWPORT)
+    prev_program = glGetIntegerv(GL_CURRENT_PROGRAM)
+    prev_vao = glGetIntegerv(GL_VERTEX_ARRAY_BINDING)
+    prev_active_texture = glGetIntegerv(GL_ACTIVE_TEXTURE)
+    prev_blend, prev_scissor = glIsEnabled(GL_BLEND), glIsEnabled(GL_SCISSOR_TEST)
+
+    fb = glGenFramebuffers(1)
+    glBindFramebuffer(GL_FRAMEBUFFER, fb)
+    glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, dst_tex_id, 0)
+    glViewport(0, 0, width, height)
+    glDisable(GL_BLEND)
+    glDisable(GL_SCISSOR_TEST)
+    glUseProgram(program)
+    glBindVertexArray(vao)
+    for unit, (name, tex_id) in enumerate(textures.items()):
+        glActiveTexture(GL_TEXTURE0 + unit)
+        glBindTexture(GL_TEXTURE_2D, tex_id)
+        glUniform1i(glGetUniformLocation(program, name), unit)
+    _profiler.count_gl(texture_binds=len(textures))
+    for name, value in uniforms.items():
+        glUniform1f(glGetUniformLocation(program, name), value)
+    glDrawArrays(GL_TRIANGLES, 0, 3)
+
+    glBindFramebuffer(GL_FRAMEBUFFER, prev_fb)
+    glDeleteFramebuffers(1, [fb])
+    glViewport(*prev_viewport)
+    glUseProgram(prev_program)
+    glBindVertexArray(prev_vao)
+    glActiveTexture(prev_active_texture)
+    if prev_blend:
+        glEnable(GL_BLEND)
+    if prev_scissor:
+        glEnable(GL_SCISSOR_TEST)
+
+
+def window_level(src_tex_id, dst_tex_id, width, height, low, high):
+    """ Map the values of a texture linearly from the range `[low, high]` into `[0, 1]` on the GPU.
+
+    Values outside of the range are clipped. `dst_tex_id` must be a RGBA texture of shape `(width, height)`.
+    `low` and `high` are in the units of the sampled values: 8-bit and 16-bit textures are normalized
+    into `[0, 1]`, and float textures are not.
+    """
+    _render_pass(_WINDOW_LEVEL_SHADER, dst_tex_id, width, height, dict(src=src_tex_id), dict(low=low, high=high))
+
+
+def colormap(src_tex_id, lut_tex_id, lut_size, dst_tex_id, width, height, low, high):
+    """ Map the values of a single-channel texture through a colormap on the GPU.
+
+    The range `[low, high]` is mapped onto the colormap, which is a RGBA texture of shape `(lut_size, 1)`,
+    such as one created by `texture` from an array of shape `(1, lut_size, 4)`. Values outside of the range
+    are clipped. The units of `low` and `high` are the same as in `window_level`.
+    """
+    _render_pass(_COLORMAP_SHADER, dst_tex_id, width, height, dict(src=src_tex_id, lut=lut_tex_id),
+                 dict(lut_size=lut_size, low=low, high=high))
+
+
+class TextureStream(object):
+    """ Asynchronous updates of an existing texture through a ring of pixel buffer objects (PBOs).
+
+    `upload` only copies the image into a mapped PBO, on a worker thread if `executor` is given.
+    The transfer into the texture is started later by `commit`, and it is carried out by the GPU without
+    stalling the render thread. This is useful for streaming large images, such as camera frames.
+
+    Texture width must be divisible by four. All the methods must be called from the thread which owns
+    the OpenGL context. It is simpler to use `concur.extra_widgets.image.Image.stream_image`, which manages
+    the stream automatically.
+    """
+    def __init__(self, tex_id, shape, n_buffers=2, executor=None):
+        """
+        Args:
+            tex_id: ID of the texture to update.
+            shape: Shape of the image arrays which are uploaded. It must match the texture.
+            n_buffers: Number of PBOs, which limits the number of images which are being copied at once.
+            executor: Optional `concurrent.futures.Executor` which copies images into PBOs.
+        """
+        self.tex_id = tex_id
+        self.shape = tuple(shape)
+        data, _, self.pixel_format, _ = _texture_data(np.zeros(self.shape, 'u1'))
+        self.nbytes = data.nbytes
+        self.executor = executor
+        self.pbos = [int(pbo) for pbo in np.atleast_1d(glGenBuffers(n_buffers))]
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_UNPACK_BUFFER, self.nbytes, None, GL_STREAM_DRAW)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        self.free = list(self.pbos)
+        self.pending = []  # Mapped PBOs and futures of the copies into them, oldest first
+
+    def __deepcopy__(self, memo):
+        # GPU resources are shared between copies of the widget state
+        return self
+
+    def upload(self, arr):
+        """ Queue an image for upload. Images which aren't committed yet are dropped if a newer one is needed.
+
+        Returns `False` if all the buffers are still being copied into, and `arr` was dropped instead.
+        """
+        if arr.shape != self.shape:
+            raise ValueError(f"Expected an image of shape {self.shape}, but got {arr.shape}.")
+        if self.free:
+            pbo = self.free.pop(0)
+        else:
+            done = [p for p in self.pending if p[1] is None or p[1].done()]
+            if not done:
+                return False
+            self.pending.remove(done[0])
+            pbo = done[0][0]
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+        # Invalidation lets the driver hand out fresh memory if the GPU still reads the previous contents
+        ptr = glMapBufferRange(GL_PIXEL_UNPACK_BUFFER, 0, self.nbytes, GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        if self.executor is None:
+            self._copy(ptr, arr)
+            self.pending.append((pbo, None))
+        else:
+            self.pending.append((pbo, self.executor.submit(self._copy, ptr, arr)))
+        return True
+
+    def _copy(self, ptr, arr):
+        data, _, _, _ = _texture_data(arr)
+        ctypes.memmove(ptr, data.ctypes.data, self.nbytes)
+
+    def commit(self):
+        """ Start transferring the newest copied image into the texture. Call this once per frame.
+
+        Images are committed in order, so a finished copy waits for older unfinished ones.
+        Returns `True` if the texture is updated.
+        """
+        n_ready = 0
+        while n_ready < len(self.pending) and (self.pending[n_ready][1] is None or self.pending[n_ready][1].done()):
+            n_ready += 1
+        if n_ready == 0:
+            return False
+        ready, self.pending = self.pending[:n_ready], self.pending[n_ready:]
+        for pbo, future in ready:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+            self.free.append(pbo)
+        glBindTexture(GL_TEXTURE_2D, self.tex_id)
+        # With a PBO bound, the data argument is an offset into the buffer
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.shape[1], self.shape[0], self.pixel_format, GL_UNSIGNED_BYTE, None)
+        _profiler.count_gl(texture_binds=1, texture_uploads=1)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        for _, future in ready:
+            if future is not None:
+                future.result()  # Re-raise any exceptions from the copy
+        return True
+
+    def delete(self):
+        """ Release the PBOs, waiting for any unfinished copies. The texture itself is not deleted. """
+        for pbo, future in self.pending:
+            if future is not None:
+                future.exception()
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        glDeleteBuffers(len(self.pbos), self.pbos)
+        self.pbos, self.free, self.pending = [], [], []
+
+
 def rm_textures(tex_ids):
     """ Delete a list of OpenGL textures. """
     glDeleteTextures(tex_ids)
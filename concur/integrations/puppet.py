@@ -16,25 +16,22 @@ import numpy as np
 
 from concur.integrations.glfw import create_window, create_window_dock, begin_maximized_window
 from concur.integrations.opengl import create_offscreen_fb, get_fb_data
+import concur.profiler as _profiler
 from imgui.integrations import compute_fb_scale
 from imgui.integrations.opengl import ProgrammablePipelineRenderer
 
 
-class PuppetRenderer(ProgrammablePipelineRenderer):
-    """Renderer for automated testing. User inputs are set programmatically, rather than interactively."""
-    def __init__(self, window):
-        super(PuppetRenderer, self).__init__()
-        self.window = window
-
-        self.io.display_size = glfw.get_framebuffer_size(self.window)
+class PuppetInput(object):
+    """ Virtual user input, which is set programmatically rather than interactively.
 
+    This is shared by `PuppetRenderer` and `concur.integrations.null.NullRenderer`.
+    """
+    def _init_inputs(self):
         self._map_keys()
-        self._gui_time = None
-
-        # self._click = [False] * 3
         self._mouse_buttons = [False] * 3
         self._mouse_pos = 100, 100
         self._mouse_wheel = 0.0
+        self._chars = []
 
     def _map_keys(self):
         key_map = self.io.key_map
@@ -59,26 +56,8 @@ class PuppetRenderer(ProgrammablePipelineRenderer):
         key_map[imgui.KEY_Y] = glfw.KEY_Y
         key_map[imgui.KEY_Z] = glfw.KEY_Z
 
-    def process_inputs(self):
-        """Process the virtual user inputs. Called by `main` at the beginning of each frame."""
+    def _process_virtual_inputs(self):
         io = self.io
-
-        window_size = glfw.get_window_size(self.window)
-        fb_size = glfw.get_framebuffer_size(self.window)
-
-        io.display_size = window_size
-        io.display_fb_scale = compute_fb_scale(window_size, fb_size)
-        io.delta_time = 1.0/60
-
-        current_time = glfw.get_time()
-
-        if self._gui_time:
-            self.io.delta_time = current_time - self._gui_time
-        else:
-            self.io.delta_time = 1. / 60.
-
-        self._gui_time = current_time
-
         # for i, b in enumerate(self._click):
         #     if b:
         #         io.mouse_down[i] = True
@@ -91,6 +70,11 @@ class PuppetRenderer(ProgrammablePipelineRenderer):
         io.mouse_pos = self._mouse_pos
         io.mouse_wheel = self._mouse_wheel
         self._mouse_wheel = 0.0
+        # Characters are queued until the next frame, because ImGui discards characters added during a frame
+        # at its end, before widgets drawn earlier in the frame could read them.
+        for c in self._chars:
+            io.add_input_character(c)
+        self._chars = []
 
     # def click(self, button=0):
     #     """Simulate a mouse button click.
@@ -131,7 +115,41 @@ class PuppetRenderer(ProgrammablePipelineRenderer):
     def write_char(self, c):
         """Write a character with a given char code."""
         assert 0 < c < 0x10000
-        imgui.get_io().add_input_character(c)
+        self._chars.append(c)
+
+
+class PuppetRenderer(PuppetInput, ProgrammablePipelineRenderer):
+    """Renderer for automated testing. User inputs are set programmatically, rather than interactively."""
+    def __init__(self, window):
+        super(PuppetRenderer, self).__init__()
+        self.window = window
+
+        self.io.display_size = glfw.get_framebuffer_size(self.window)
+
+        self._init_inputs()
+        self._gui_time = None
+
+    def process_inputs(self):
+        """Process the virtual user inputs. Called by `main` at the beginning of each frame."""
+        io = self.io
+
+        window_size = glfw.get_window_size(self.window)
+        fb_size = glfw.get_framebuffer_size(self.window)
+
+        io.display_size = window_size
+        io.display_fb_scale = compute_fb_scale(window_size, fb_size)
+        io.delta_time = 1.0/60
+
+        current_time = glfw.get_time()
+
+        if self._gui_time:
+            self.io.delta_time = current_time - self._gui_time
+        else:
+            self.io.delta_time = 1. / 60.
+
+        self._gui_time = current_time
+
+        self._process_virtual_inputs()
 
 
 def main(widget_gen, name="Concur Puppet", width=640, height=480, save_screencast=None, return_sshot=False, headless=False, fps=60):
@@ -142,6 +160,7 @@ def main(widget_gen, name="Concur Puppet", width=640, height=480, save_screencas
 
     `widget_gen` takes as an argument a `PuppetRenderer` instance, and returns a widget.
     `fps` optionally limits FPS (if None, FPS is unlimited)
+    Counters of the drawn geometry are returned by `concur.profiler.draw_stats`.
     """
     imgui.create_context()
 
@@ -160,6 +179,7 @@ def main(widget_gen, name="Concur Puppet", width=640, height=480, save_screencas
     try:
         while not glfw.window_should_close(window):
             t0 = time.perf_counter()
+            _profiler.begin_phases()
             glfw.poll_events()
             impl.process_inputs()
 
@@ -169,15 +189,19 @@ def main(widget_gen, name="Concur Puppet", width=640, height=480, save_screencas
             begin_maximized_window("Default##Concur", window)
 
             try:
-                next(widget)
+                _profiler.begin_frame()
+                _profiler.resume("Default##Concur", widget)
             except StopIteration:
                 break
             finally:
+                _profiler.end_frame()
                 imgui.end()
+                _profiler.end_phase()
 
                 gl.glClearColor(0.5, 0.5, 0.5, 1)
                 gl.glClear(gl.GL_COLOR_BUFFER_BIT)
                 imgui.render()
+                _profiler.end_phase()
 
                 if save_screencast:
                     gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, offscreen_fb)
@@ -187,6 +211,8 @@ def main(widget_gen, name="Concur Puppet", width=640, height=480, save_screencas
                 gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
 
                 impl.render(imgui.get_draw_data())
+                _profiler.end_draw(imgui.get_draw_data())
+                _profiler.end_phases(gl.glFinish)
                 glfw.swap_buffers(window)
 
             t1 = time.perf_counter()
@@ -0,0 +1,253 @@
+""" Opt-in profiler, which measures the time spent in each widget.
+
+Composite widgets such as `concur.core.orr`, `concur.widgets.window`, `concur.widgets.child`, or
+`concur.extra_widgets.pan_zoom.pan_zoom` time the resumption of their children. The timings are keyed by
+paths such as `Default##Concur/0/Image/Pan-zoom/1`, which mirror the ImGui ID stack.
+
+```python
+profiler = c.profiler.start(sample_every=10)
+c.main(app())
+print(profiler.format_table())
+profiler.save_chrome_trace("trace.json")  # Open in chrome://tracing, or https://ui.perfetto.dev
+```
+
+Frames which aren't sampled have negligible overhead, so the profiler can be left enabled with a large
+`sample_every` in production.
+
+Independently of the profiler, the main loops count the geometry of each frame, and the texture binds and uploads
+done through `concur.integrations.opengl`. The counts of the last drawn frame are returned by `draw_stats`:
+
+```python
+def app():
+    while True:
+        yield from c.frame("Frame", view, content_gen=markers)
+        stats = c.profiler.draw_stats()  # Counts of the previous frame
+        assert stats is None or stats["vertices"] < 100000
+        yield
+```
+"""
+
+
+import collections
+import json
+import time
+
+
+# Profiler recording the current frame. `None` if the frame isn't profiled.
+_current = None
+
+# Profiler which is started
+_active = None
+
+# Phases of a frame measured by `PhaseRecorder`
+PHASES = ["logic", "render", "submit"]
+
+# `PhaseRecorder` of a running `concur.benchmark`, or `None`
+_phase_recorder = None
+
+# Counters returned by `draw_stats`
+DRAW_STATS = ["cmd_lists", "vertices", "indices", "draw_cmds", "texture_binds", "texture_uploads"]
+
+# Texture binds and uploads since the end of the last frame, counted by `count_gl`
+_gl_counts = dict(texture_binds=0, texture_uploads=0)
+
+# Counters of the last drawn frame
+_draw_stats = None
+
+
+def start(sample_every=1, max_frames=300):
+    """ Start profiling in the main loop, and return the `Profiler` object. """
+    global _active
+    _active = Profiler(sample_every, max_frames)
+    return _active
+
+
+def stop():
+    """ Stop profiling, and return the `Profiler` object, or `None` if it wasn't started. """
+    global _active, _current
+    profiler, _active, _current = _active, None, None
+    return profiler
+
+
+def begin_frame():
+    """ Called by the main loops before the widget is resumed. """
+    if _active is not None:
+        _active.begin_frame()
+
+
+def end_frame():
+    """ Called by the main loops after the widget is resumed. """
+    if _active is not None:
+        _active.end_frame()
+
+
+def begin_phases():
+    """ Called by the main loops at the start of each frame, before processing the input. """
+    if _phase_recorder is not None:
+        _phase_recorder.begin_frame()
+
+
+def end_phase():
+    """ Called by the main loops at the end of the `logic` and `render` phases. """
+    if _phase_recorder is not None:
+        _phase_recorder.end_phase()
+
+
+def end_phases(sync=None):
+    """ Called by the main loops at the end of each frame. `sync` waits for the GPU, if the phases are recorded. """
+    if _phase_recorder is not None:
+        if sync is not None:
+            sync()
+        _phase_recorder.end_phase()
+        _phase_recorder.end_frame()
+
+
+def count_gl(texture_binds=0, texture_uploads=0):
+    """ Called by `concur.integrations.opengl` when it binds or uploads textures. """
+    _gl_counts["texture_binds"] += texture_binds
+    _gl_counts["texture_uploads"] += texture_uploads
+
+
+def end_draw(draw_data):
+    """ Called by the main loops after the draw data of a frame is rendered. """
+    global _draw_stats
+    _draw_stats = dict(
+        cmd_lists=draw_data.cmd_count,
+        vertices=draw_data.total_vtx_count,
+        indices=draw_data.total_idx_count,
+        draw_cmds=sum(cmd_list.cmd_buffer_size for cmd_list in draw_data.commands_lists),
+        **_gl_counts)
+    _gl_counts.update(texture_binds=0, texture_uploads=0)
+
+
+def draw_stats():
+    """ Counters of the last frame drawn by the main loop, or `None` before the first frame is drawn.
+
+    Returns:
+        Dict with the number of ImGui command lists (`cmd_lists`), `vertices`, `indices`, and draw commands
+        (`draw_cmds`), which are roughly the draw calls of the back-end. `texture_binds` and `texture_uploads`
+        count only the calls of `concur.integrations.opengl`, for example by `concur.extra_widgets.image.Image`,
+        not the binds done by the back-end when drawing.
+    """
+    return _draw_stats
+
+
+class PhaseRecorder(object):
+    """ Durations of the `PHASES` of each frame, recorded by `concur.benchmark`, and the `draw_stats`. """
+    def __init__(self):
+        self.frames = []  # Lists of phase durations in seconds
+        self.draw = []  # Draw statistics of the recorded frames
+        self.phases = None
+        self.t = None
+
+    def begin_frame(self):
+        self.phases = []
+        self.t = time.perf_counter()
+
+    def end_phase(self):
+        if self.phases is not None:
+            t = time.perf_counter()
+            self.phases.append(t - self.t)
+            self.t = t
+
+    def end_frame(self):
+        if self.phases is not None and len(self.phases) == len(PHASES):
+            self.frames.append(self.phases)
+            self.draw.append(_draw_stats)
+        self.phases = None
+
+
+def resume(label, widget):
+    """ Resume `widget` using `next`, timing it under `label` if the current frame is profiled. """
+    if _current is None:
+        return next(widget)
+    return _current.resume(label, widget)
+
+
+class Profiler(object):
+    """ Widget timings of the last `max_frames` sampled frames. Use `start` to create one. """
+    def __init__(self, sample_every=1, max_frames=300):
+        """
+        Args:
+            sample_every: Profile only every n-th frame.
+            max_frames: Number of sampled frames to keep.
+        """
+        self.sample_every = sample_every
+        # Sampled frames as `(frame index, start time, duration, records)`, where records are
+        # `(path, start time, duration)` tuples in the order of their completion.
+        self.frames = collections.deque(maxlen=max_frames)
+        self.frame_index = 0
+        self.path = []
+        self.records = []
+        self.frame_start = None
+
+    def begin_frame(self):
+        global _current
+        if self.frame_index % self.sample_every == 0:
+            self.path = []
+            self.records = []
+            _current = self
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        global _current
+        if _current is self:
+            _current = None
+            duration = time.perf_counter() - self.frame_start
+            self.frames.append((self.frame_index, self.frame_start, duration, self.records))
+        self.frame_index += 1
+
+    def resume(self, label, widget):
+        self.path.append(label)
+        t0 = time.perf_counter()
+        try:
+            return next(widget)
+        finally:
+            self.records.append(("/".join(self.path), t0, time.perf_counter() - t0))
+            self.path.pop()
+
+    def table(self):
+        """ Aggregate the timings per path.
+
+        Returns:
+            List of `(path, calls, total, own)` tuples sorted by `total` in descending order, where `calls`
+            is the mean number of resumptions per frame, and `total` and `own` are mean times per frame in
+            seconds, including or excluding the children.
+        """
+        n = max(1, len(self.frames))
+        calls = collections.Counter()
+        totals = collections.Counter()
+        for _, _, _, records in self.frames:
+            for path, _, duration in records:
+                calls[path] += 1
+                totals[path] += duration
+        children = collections.Counter()
+        for path, total in totals.items():
+            parent = path.rpartition("/")[0]
+            if parent in totals:
+                children[parent] += total
+        rows = [(path, calls[path] / n, total / n, (total - children[path]) / n) for path, total in totals.items()]
+        return sorted(rows, key=lambda row: -row[2])
+
+    def format_table(self, limit=30):
+        """ Format the `table` as text, limited to `limit` most expensive paths. """
+        lines = [f"{'total ms':>9} {'own ms':>9} {'calls':>7}  path"]
+        for path, calls, total, own in self.table()[:limit]:
+            lines.append(f"{total * 1000:9.3f} {own * 1000:9.3f} {calls:7.1f}  {path}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """ Return the recorded frames in the Chrome trace event format, as a JSON-serializable dict. """
+        events = []
+        for index, start, duration, records in self.frames:
+            events.append(dict(name="frame", cat="frame", ph="X", pid=0, tid=0,
+                               ts=start * 1e6, dur=duration * 1e6, args=dict(index=index)))
+            for path, t0, dt in records:
+                events.append(dict(name=path.rpartition("/")[2], cat="widget", ph="X", pid=0, tid=0,
+                                   ts=t0 * 1e6, dur=dt * 1e6, args=dict(path=path)))
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def save_chrome_trace(self, filename):
+        """ Save `chrome_trace` into a JSON file. """
+        with open(filename, "w") as f:
+            json.dump(self.chrome_trace(), f)
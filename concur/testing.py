@@ -11,7 +11,8 @@ import os
 import imgui
 import numpy as np  # for floating point ranges
 from functools import partial
-from concur.integrations.puppet import PuppetRenderer, main
+from concur.integrations.puppet import PuppetInput, main
+import concur.integrations.null
 from concur.draw import polyline
 from concur.core import orr, optional
 import concur.widgets
@@ -20,7 +21,15 @@ import concur.widgets
 __pdoc__ = dict(test=False)
 
 
+def _headless():
+    return 'HEADLESS_TEST' in os.environ and os.environ['HEADLESS_TEST'] == '1'
+
+
 def test(widget_gen, slow=None, draw_cursor=True, width=512, height=512, *args, **argv):
+    if _headless():
+        return concur.integrations.null.main(
+            lambda renderer: widget_gen(draw_cursor, Testing(renderer, slow)),
+            width, height)
     return main(
         lambda puppet_renderer: widget_gen(draw_cursor, Testing(puppet_renderer, slow)),
         "Automatic Tester",
@@ -50,9 +59,12 @@ def test_widget(f):
     SLOW_TEST=1 pytest -k test_example
     ```
 
+    To run the tests without a display using the `concur.integrations.null` back-end, set `HEADLESS_TEST=1`.
+    Tests of widgets which use OpenGL directly, such as images, fail in this mode.
+
     The decorated testing function takes a single argument `tester`, which contains a `Testing` class instance.
     This class provides convenient functions for user input automation, wrapping the raw user interaction
-    primitives from `concur.integrations.puppet.PuppetRenderer`.
+    primitives from `concur.integrations.puppet.PuppetRenderer`, or `concur.integrations.null.NullRenderer`.
     """
     def widget_gen(draw_cursor, tester):
         io = imgui.get_io()
@@ -67,20 +79,52 @@ def test_widget(f):
     return g
 
 
-def benchmark_widget(f_gen):
-    """ Benchmark a widget (experimental).
+def benchmark_widget(f_gen, frames=240, warmup=30):
+    """ Benchmark a widget using `concur.benchmark.run` (experimental).
+
+    The decorated function is a test for [pytest-benchmark](https://pytest-benchmark.readthedocs.io).
+    Frame-time statistics are stored in the `extra_info` of the benchmark, so they are a part of its JSON output.
+    With `HEADLESS_TEST=1`, the `null` back-end is used, which measures only the CPU time.
 
     See tests/test_draw.py for example usage.
     """
-    f = f_gen()
+    import concur.benchmark
+
+    def g(benchmark):
+        backend = "null" if _headless() else "puppet"
+        result = benchmark.pedantic(
+            concur.benchmark.run, (lambda _: f_gen(),), dict(frames=frames, warmup=warmup, backend=backend), rounds=1)
+        benchmark.extra_info.update(result)
+
+    return g
 
-    def widget(_):
-        for _ in range(240):
-            next(f)
-            yield
+
+def benchmark_scenario(f, frames=100000, warmup=10):
+    """ Benchmark a scripted user interaction with an app (experimental).
+
+    The decorated function takes a `Testing` instance, as with `test_widget`, and returns a widget which
+    runs the app together with an interaction script, typically composed by `concur.core.orr`.
+    Frames are measured until the widget returns. Frame-time statistics are stored in the `extra_info`
+    of the [pytest-benchmark](https://pytest-benchmark.readthedocs.io) fixture, as with `benchmark_widget`.
+
+    ```python
+    @c.testing.benchmark_scenario
+    def test_pan_zoom_perf(tester):
+        def script():
+            yield from tester.drag(250, 250, 150, 200, button=1)  # Pan
+            for _ in range(5):
+                yield from tester.scroll_up()  # Zoom in
+        yield from c.orr([app(), script()])
+    ```
+    """
+    import concur.benchmark
 
     def g(benchmark):
-        benchmark.pedantic(main, (widget, "Perf Tester", 512, 512), dict(fps=None), rounds=1)
+        backend = "null" if _headless() else "puppet"
+        result = benchmark.pedantic(
+            concur.benchmark.run, (lambda renderer: window(f(Testing(renderer, slow=False))),),
+            dict(frames=frames, warmup=warmup, backend=backend), rounds=1)
+        benchmark.extra_info.update(result)
 
     return g
 
@@ -92,7 +136,7 @@ def window(widget):
 
 
 class Testing(object):
-    """ Must be used in conjunction with the `concur.integrations.puppet` backend.
+    """ Must be used in conjunction with the `concur.integrations.puppet` or `concur.integrations.null` backend.
 
     To setup all the plumbing effortlessly, use the `test_widget` decorator.
 
@@ -100,7 +144,7 @@ class Testing(object):
     `concur.core.orr`, `yield from`, and friends.
     """
     def __init__(self, puppet_renderer, slow=None):
-        assert isinstance(puppet_renderer, PuppetRenderer)
+        assert isinstance(puppet_renderer, PuppetInput)
         self.puppet = puppet_renderer
         if slow is None:
             self.slow = 'SLOW_TEST' in os.environ and os.environ['SLOW_TEST'] == '1'
@@ -163,6 +207,20 @@ class Testing(object):
             self.puppet.set_mouse_pos(x, y)
             yield
 
+    def drag(self, x0, y0, x1, y1, button=0, steps=10):
+        "Drag the mouse from `x0, y0` to `x1, y1` over `steps` frames, holding the given mouse button."
+        yield from self.move_cursor(x0, y0)
+        yield from self.mouse_dn(button)
+        for f in np.linspace(0, 1, steps + 1)[1:]:
+            self.puppet.set_mouse_pos(x1 * f + x0 * (1 - f), y1 * f + y0 * (1 - f))
+            yield
+        yield from self.mouse_up(button)
+
+    def type_text(self, text):
+        "Write a string, one character per frame."
+        for ch in text:
+            yield from self.write_char(ord(ch))
+
     def scroll_up(self):
         "Scroll up."
         self.puppet.scroll_up()
@@ -24,6 +24,7 @@ import numpy as np  # for `transform`
 
 from concur.colors import color_to_rgba_tuple
 from concur.core import nothing, orr, lift, Widget, interactive_elem
+import concur.profiler as _profiler
 
 
 def orr_same_line(widgets):
@@ -64,7 +65,7 @@ def window(title: str,
         expanded, opened = imgui.begin(title, flags=flags)
         try:
             if expanded and opened:
-                next(widget)
+                _profiler.resume(title, widget)
         except StopIteration as e:
             return e.value
         finally:
@@ -94,7 +95,7 @@ def child(name, widget, width, height, border=False, flags=0):
     while True:
         imgui.begin_child(name, width, height, border, flags)
         try:
-            next(widget)
+            _profiler.resume(name, widget)
         except StopIteration as e:
             return e.value
         finally:
@@ -102,29 +103,112 @@ def child(name, widget, width, height, border=False, flags=0):
         yield
 
 
-def collapsing_header(text, widget, open=True):
+def virtual_list(name, n_rows, row_gen, width=0, height=0, row_height=None, border=False, flags=0):
+    """ Create a scrollable box with `n_rows` rows, of which only the visible ones exist as widgets.
+
+    This is meant for long lists, where `concur.core.orr` would resume every row in each frame. Rows are
+    created by calling `row_gen(i)`, when they are scrolled into view, and dropped when they are scrolled out.
+    The cost of a frame is proportional to the number of visible rows, not to `n_rows`. The first event fired
+    by any row is returned. Rows have a constant height, by default the height of a button.
+
+    ```python
+    c.virtual_list("Log", len(lines), lambda i: c.tag_value(i, c.selectable(lines[i], i == selected)))
+    ```
+
+    Scroll position is kept by ImGui between widget re-creations, as long as `name` stays the same.
+
+    Args:
+        name: Box identifier.
+        n_rows: Number of rows.
+        row_gen: Function creating the widget of a row from its index.
+        width: Box width. See `concur.widgets.child` for details.
+        height: Box height.
+        row_height: Row height in pixels including spacing, or `None` for `imgui.get_frame_height_with_spacing()`.
+        border: Toggle border visibility.
+        flags: Advanced customization flags for the box.
+    """
+    rows = {}
+    while True:
+        imgui.begin_child(name, width, height, border, flags)
+        try:
+            row_h = row_height or imgui.get_frame_height_with_spacing()
+            start_y = imgui.get_cursor_pos_y()
+            first = min(n_rows, int(max(0, imgui.get_scroll_y() - start_y) // row_h))
+            last = min(n_rows, first + int(imgui.get_window_height() // row_h) + 2)
+            rows = {i: rows[i] if i in rows else row_gen(i) for i in range(first, last)}
+            stop, value = False, None
+            for i, row in rows.items():
+                imgui.set_cursor_pos_y(start_y + i * row_h)
+                imgui.push_id(str(i))
+                try:
+                    _profiler.resume(str(i), row)
+                except StopIteration as e:
+                    if not stop:
+                        stop, value = True, e.value
+                finally:
+                    imgui.pop_id()
+            # Extend the content to the full list height, so that the scrollbar is right
+            imgui.set_cursor_pos_y(start_y + n_rows * row_h)
+            imgui.dummy(0, 0)
+        finally:
+            imgui.end_child()
+        if stop:
+            return value
+        yield
+
+
+class _Lazy(object):
+    """ Content of a container widget, which is either a widget, or a function creating it when first shown. """
+    def __init__(self, widget, release):
+        if release and not callable(widget):
+            raise ValueError("Only content created by a function can be released.")
+        self.factory = widget if callable(widget) else None
+        self.widget = None if callable(widget) else widget
+        self.release = release
+
+    def get(self):
+        if self.widget is None:
+            self.widget = self.factory()
+        return self.widget
+
+    def hide(self):
+        if self.release:
+            self.widget = None
+
+
+def collapsing_header(text, widget, open=True, release=False):
     """Display a collapsible section header. It can be open or closed by default (parameter `open`).
+
+    `widget` may be a function without arguments, which creates the content when the header is first expanded.
+    If `release` is `True`, the content is dropped when the header is collapsed, and created again on expansion.
     """
+    content = _Lazy(widget, release)
     while True:
         expanded, visible = imgui.collapsing_header(text, flags=open and imgui.TREE_NODE_DEFAULT_OPEN)
         try:
             if expanded:
-                next(widget)
+                _profiler.resume(text, content.get())
+            else:
+                content.hide()
         except StopIteration as e:
             return e.value
         yield
 
 
-def tree_node(text, widget, open=True):
+def tree_node(text, widget, open=True, release=False):
     """Display a collapsible tree node. It can be open or closed by default (parameter `open`).
 
-    Tree node content has left offset, unlike `collapsing_header`.
+    Tree node content has left offset, unlike `collapsing_header`. The content can be created lazily,
+    see `collapsing_header`.
     """
+    content = _Lazy(widget, release)
     while True:
         expanded = imgui.tree_node(text, flags=open and imgui.TREE_NODE_DEFAULT_OPEN)
         try:
             if expanded:
-                next(widget)
+                _profiler.resume(text, content.get())
+            else:
+                content.hide()
         except StopIteration as e:
             return e.value
         finally:
@@ -272,8 +356,13 @@ def text_tooltip(text, widget):
         yield
 
 
-def tooltip(tooltip_widget, widget):
-    """ Display a widget tooltip on hover. May contain arbitrary elements, such as images. """
+def tooltip(tooltip_widget, widget, release=False):
+    """ Display a widget tooltip on hover. May contain arbitrary elements, such as images.
+
+    `tooltip_widget` may be a function without arguments, which creates the tooltip when it is first shown.
+    If `release` is `True`, the tooltip is dropped when it is hidden, and created again when shown.
+    """
+    content = _Lazy(tooltip_widget, release)
     while True:
         try:
             imgui.begin_group()
@@ -286,11 +375,13 @@ def tooltip(tooltip_widget, widget):
         if imgui.is_item_hovered():
             try:
                 imgui.begin_tooltip()
-                next(tooltip_widget)
+                _profiler.resume("Tooltip", content.get())
             except StopIteration as e:
                 return e.value
             finally:
                 imgui.end_tooltip()
+        else:
+            content.hide()
         yield
 
 
@@ -317,16 +408,20 @@ def main_menu_bar(widget):
         yield
 
 
-def menu(label, widget, enabled=True):
+def menu(label, widget, enabled=True, release=False):
     """ Create an expandable menu in the `main_menu_bar`.
 
-    Widgets commonly used in menus are `menu_item`, and `separator`.
+    Widgets commonly used in menus are `menu_item`, and `separator`. The content can be created lazily,
+    see `collapsing_header`.
     """
+    content = _Lazy(widget, release)
     while True:
         expanded = imgui.begin_menu(label, enabled)
         try:
             if expanded:
-                next(widget)
+                _profiler.resume(label, content.get())
+            else:
+                content.hide()
         except StopIteration as e:
             return e.value
         finally:
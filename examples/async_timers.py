@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+import asyncio
+import concur as c
+
+
+def timer():
+    yield from c.orr([c.text(""), c.button("Start timer")])
+    yield
+    yield from c.orr([c.text("waiting for 3s..."), c.button("Cancel"), c.task(asyncio.sleep(3))])
+
+
+def app():
+    return c.orr([c.forever(timer) for _ in range(3)])
+
+
+if __name__ == "__main__":
+    asyncio.run(c.main_async(app(), "Async Timers"))
@@ -11,11 +11,12 @@ def app():
     todos = [("Write a Todo app", True), ("Take out garbage", False)]
     disp = [True, False]
     edited = ""
+    rows = c.Keyed(tag_value=True)
 
     while True:
         tag, value = yield from c.orr([
             c.orr_same_line([c.button("All"), c.button("Active"), c.button("Completed")]),
-            c.orr([c.tag_value(i, item(s, a)) for i, (s, a) in enumerate(todos) if a in disp]),
+            c.orr(rows((i, item, (s, a)) for i, (s, a) in enumerate(todos) if a in disp)),
             c.orr_same_line([c.button("+"), c.input_text("New Item", edited, 30)]),
             ])
         if tag == "New Item":
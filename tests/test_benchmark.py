@@ -0,0 +1,68 @@
+import concur as c
+import concur.benchmark
+import os
+import subprocess
+import sys
+
+
+def button_app(renderer):
+    while True:
+        yield from c.orr([c.button("Button"), c.text("Text")])
+        yield
+
+
+def test_benchmark_run():
+    result = c.benchmark.run(button_app, frames=50, warmup=5)
+    assert result["frames"] == 50
+    for phase in ["total"] + c.benchmark.PHASES:
+        stats = result[phase]
+        assert stats["p50"] <= stats["p95"] <= stats["p99"] <= stats["max"]
+    assert result["submit"]["max"] < 1
+    assert 0 < result["draw"]["vertices"]["mean"] <= result["draw"]["vertices"]["max"]
+    assert result["draw"]["texture_uploads"]["max"] == 0
+
+
+def test_benchmark_early_return():
+    def app(renderer):
+        for _ in range(10):
+            yield
+        return None
+    assert c.benchmark.run(app, frames=50, warmup=5)["frames"] == 5
+
+
+def test_benchmark_compare(tmp_path, capsys):
+    result = c.benchmark.run(button_app, frames=20, warmup=2)
+    slower = {phase: {stat: value * 2 for stat, value in result[phase].items()} for phase in ["total"] + c.benchmark.PHASES}
+    c.benchmark.save({"button": result}, tmp_path / "base.json")
+    c.benchmark.save({"button": dict(result, **slower)}, tmp_path / "current.json")
+    assert c.benchmark._main(["compare", str(tmp_path / "base.json"), str(tmp_path / "base.json")]) == 0
+    assert c.benchmark._main(["compare", str(tmp_path / "base.json"), str(tmp_path / "current.json")]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+
+
+def test_load_pytest_benchmark_json(tmp_path):
+    (tmp_path / "test_app.py").write_text(
+        "import concur as c\n"
+        "\n"
+        "@c.testing.benchmark_widget\n"
+        "def test_button_perf():\n"
+        "    while True:\n"
+        "        yield from c.button('Button')\n"
+        "        yield\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(c.__file__)))
+    env = dict(os.environ, HEADLESS_TEST="1", PYTHONPATH=os.pathsep.join([root, os.environ.get("PYTHONPATH", "")]))
+    subprocess.run([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", str(tmp_path / "test_app.py"),
+                    f"--benchmark-json={tmp_path / 'bench.json'}"], cwd=tmp_path, env=env, check=True)
+    results = c.benchmark.load(tmp_path / "bench.json")
+    assert list(results) == ["test_button_perf"]
+    rows = c.benchmark.compare(results, results)
+    assert len(rows) == 1 + len(c.benchmark.PHASES) and not any(row[4] for row in rows)
+
+
+def test_core_suite():
+    import imgui
+    results = c.benchmark.core_suite(frames=5, warmup=1, filter="depth/")
+    assert set(results) == {f"{case}/depth/{depth}" for case in ["orr", "tag_map"] for depth in [1, 5, 10, 50]}
+    assert all(result["frames"] == 5 for result in results.values())
+    # The ImGui ID stack is restored
+    assert c.core.push_id is imgui.push_id
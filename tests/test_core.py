@@ -0,0 +1,277 @@
+import concur as c
+import concur.core
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import numpy as np
+import pytest
+
+
+def wait_for_wake(fn):
+    """ Run `fn` with a wake handler installed, returning the number of wake-ups. """
+    wakes = []
+    concur.core._redraw_requested.clear()
+    concur.core._wake_handler = lambda: wakes.append(threading.current_thread())
+    try:
+        fn()
+    finally:
+        concur.core._wake_handler = None
+    return wakes
+
+
+def test_invalidate():
+    wakes = wait_for_wake(c.invalidate)
+    assert len(wakes) == 1
+    assert concur.core._redraw_requested.is_set()
+
+
+def test_queue_wakes():
+    q = c.Queue()
+    def run():
+        t = threading.Thread(target=q.put, args=("msg",))
+        t.start()
+        t.join()
+    wakes = wait_for_wake(run)
+    assert len(wakes) == 1
+    assert q.get_nowait() == "msg"
+
+
+def test_block_wakes():
+    def run():
+        with ThreadPoolExecutor(1) as executor:
+            block = c.Block(executor.submit(time.sleep, 0.01))
+            executor.shutdown()
+            assert block.future.done()
+    wakes = wait_for_wake(run)
+    assert len(wakes) == 1
+
+
+def test_task():
+    async def run():
+        widget = c.task(asyncio.sleep(0.01, result="done"))
+        while True:
+            try:
+                next(widget)
+            except StopIteration as e:
+                return e.value
+            await asyncio.sleep(0.001)
+    assert asyncio.run(run()) == "done"
+
+
+def test_task_cancel():
+    async def run():
+        widget = c.task(asyncio.sleep(10))
+        next(widget)
+        future = widget.future
+        del widget
+        await asyncio.sleep(0)
+        return future.cancelled()
+    assert asyncio.run(run())
+
+
+def test_computation_latest_wins():
+    calls = []
+
+    def slow_square(x):
+        calls.append(x)
+        time.sleep(0.05)
+        return x * x
+
+    with ThreadPoolExecutor(1) as executor:
+        comp = c.Computation(executor, slow_square)
+        comp.request(1)
+        comp.poll()
+        for x in range(2, 10):
+            comp.request(x)
+            comp.poll()
+        results = []
+        widget = c.computation("Result", comp)
+        t0 = time.perf_counter()
+        while comp.pending and time.perf_counter() - t0 < 5:
+            try:
+                next(widget)
+            except StopIteration as e:
+                results.append(e.value)
+                widget = c.computation("Result", comp)
+            time.sleep(0.001)
+    # The first job was already running, the intermediate ones were dropped
+    assert calls == [1, 9]
+    assert results == [("Result", 1), ("Result", 81)]
+    assert comp.result_input == 9
+
+
+def test_computation_debounce():
+    with ThreadPoolExecutor(1) as executor:
+        comp = c.Computation(executor, lambda x: x, debounce=0.05)
+        comp.request(1)
+        assert not comp.poll() and comp.future is None
+        time.sleep(0.06)
+        comp.poll()
+        assert comp.future is not None and comp.future_input == 1
+
+
+def drive_stream(st, timeout=5):
+    values = []
+    t0 = time.perf_counter()
+    while not st.done and time.perf_counter() - t0 < timeout:
+        if st.poll():
+            values.append(st.value)
+        time.sleep(0.001)
+    return values
+
+
+def test_stream_drops_intermediate():
+    def source():
+        for i in range(200):
+            time.sleep(0.001)
+            yield i
+
+    st = c.Stream(source(), total=200, max_fps=20)
+    values = drive_stream(st)
+    assert values[-1] == 199
+    assert len(values) < 50
+    assert st.progress == 1.
+
+
+def test_stream_hands_off_held_item():
+    def source():
+        yield "A"
+        yield "B"  # Arrives within the rate-limit interval after "A"
+        time.sleep(1)
+        yield "C"
+
+    st = c.Stream(source(), max_fps=10)
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < 0.5:
+        st.poll()
+        time.sleep(0.001)
+    # "B" is shown after the interval, not only when "C" arrives
+    assert st.value == "B" and not st.done
+    st.cancel()
+
+
+def test_stream_backpressure():
+    async def source():
+        for i in range(20):
+            yield i
+
+    st = c.Stream(source(), max_fps=1000, backpressure=True)
+    assert drive_stream(st) == list(range(20))
+
+
+def test_stream_cancel():
+    closed = threading.Event()
+
+    def source():
+        try:
+            while True:
+                yield 0
+        finally:
+            closed.set()
+
+    st = c.Stream(source(), backpressure=True)
+    del st
+    assert closed.wait(1)
+
+
+def test_stream_error():
+    def source():
+        yield 1
+        raise ValueError("Failed")
+
+    st = c.Stream(source())
+    with pytest.raises(ValueError):
+        drive_stream(st)
+
+
+def counter(name, log):
+    """ Widget which counts its frames, and returns its name on the third one. """
+    log.append(name)
+    for i in range(2):
+        yield
+    return name, i
+
+
+def run_frames(widget, n):
+    """ Resume a widget outside of ImGui, returning its event or `None`. """
+    c.core.push_id = c.core.pop_id = lambda *args: None
+    try:
+        for _ in range(n):
+            next(widget)
+    except StopIteration as e:
+        return e.value
+    finally:
+        import imgui
+        c.core.push_id, c.core.pop_id = imgui.push_id, imgui.pop_id
+
+
+def test_keyed_reuse():
+    log = []
+    rows = c.Keyed(tag_value=True)
+    assert run_frames(c.orr(rows([("a", counter, ("A", log)), ("b", counter, ("B", log))])), 2) is None
+    # "a" is reused, "b" has different arguments, and "c" is new
+    widget = c.orr(rows([("a", counter, ("A", log)), ("b", counter, ("B2", log)), ("c", counter, ("C", log))]))
+    assert run_frames(widget, 1) == ("A", ("a", 1))
+    assert log == ["A", "B", "B2", "C"]
+    assert set(rows.children) == {"a", "b", "c"}
+    # "a" has returned, so it is re-created, and "c" is dropped
+    run_frames(c.orr(rows([("a", counter, ("A", log)), ("b", counter, ("B2", log))])), 1)
+    assert log == ["A", "B", "B2", "C", "A"]
+    assert set(rows.children) == {"a", "b"}
+
+
+def test_memoize():
+    calls = []
+
+    @c.memoize(maxsize=2, max_bytes=1000)
+    def prepare(arr, scale=1):
+        calls.append(scale)
+        return arr * scale
+
+    a = np.arange(10)
+    r = prepare(a, scale=2)
+    assert prepare(a.copy(), scale=2) is r
+    a[0] = 5
+    assert prepare(a, scale=2) is not r
+    prepare(a, scale=3)
+    prepare(a, scale=4)
+    # The least recently used result is evicted
+    prepare(a, scale=3)
+    prepare(a, scale=2)
+    assert calls == [2, 2, 3, 4, 2]
+    # Results over the byte limit are evicted, apart from the last one
+    big = np.zeros(200)
+    prepare(big)
+    prepare(a, scale=3)
+    assert calls[-2:] == [1, 3]
+
+
+def test_memoize_unhashable_freed():
+    class Points(object):
+        __hash__ = None  # Unhashable, so keyed by identity
+
+        def __init__(self, n):
+            self.n = n
+
+    @c.memoize(maxsize=4)
+    def prepare(points, arr):
+        return points.n
+
+    # Freed arguments must not leave behind entries which match objects re-using their ids
+    for i in range(200):
+        assert prepare(Points(i), np.array([None], object)) == i
+
+
+def test_memoize_by_identity():
+    calls = []
+
+    @c.memoize(by_content=False)
+    def prepare(arr):
+        calls.append(1)
+        return arr.sum()
+
+    a = np.arange(10)
+    prepare(a), prepare(a), prepare(a.copy())
+    assert len(calls) == 2
@@ -2,12 +2,15 @@ import concur as c
 import numpy as np
 
 
+def _perf_polylines():
+    side, length = int(np.sqrt(10000)), 4
+    x, y, t = np.meshgrid(np.linspace(0, 1, side), np.linspace(0, 1, side), np.linspace(0, 2 * np.pi, length, endpoint=False))
+    return np.stack([np.sin(t) * 1/side/2 + x, np.cos(t) * 1/side/2 + y], axis=3).reshape(-1, length, 2)
+
 
 @c.testing.benchmark_widget
 def test_polylines_perf():
-    side, length = int(np.sqrt(10000)), 4
-    x, y, t = np.meshgrid(np.linspace(0, 1, side), np.linspace(0, 1, side), np.linspace(0, 2 * np.pi, length, endpoint=False))
-    polylines = np.stack([np.sin(t) * 1/side/2 + x, np.cos(t) * 1/side/2 + y], axis=3).reshape(-1, length, 2)
+    polylines = _perf_polylines()
     im = c.Image()
 
     def content(tf):
@@ -17,6 +20,111 @@ def test_polylines_perf():
         yield
 
 
+@c.testing.benchmark_widget
+def test_polylines_perf_baseline():
+    """ Same as `test_polylines_perf`, but each polyline is submitted separately. """
+    polylines = _perf_polylines()
+    im = c.Image()
+
+    def content(tf):
+        return c.orr([c.draw.polyline(pts, 'white', tf=tf) for pts in polylines])
+    while True:
+        yield from c.image("Image", im, content_gen=content)
+        yield
+
+
+@c.testing.benchmark_widget
+def test_scatter_perf():
+    np.random.seed(0)
+    pts = np.random.rand(100000, 2)
+    im = c.Image()
+
+    def content(tf):
+        return c.orr([
+            c.draw.scatter(pts, 'white', 'x', tf=tf),
+            c.draw.scatter(pts, 'green', '.', marker_size=3, tf=tf),
+            ])
+    while True:
+        yield from c.image("Image", im, content_gen=content)
+        yield
+
+
+@c.testing.benchmark_widget
+def test_culling_perf():
+    """ Only a small fraction of the shapes is inside the view. """
+    np.random.seed(0)
+    pts = np.random.rand(100000, 2) * 1000
+    markers = c.draw.Retained(c.draw.scatter, pts, 'black', 'o')
+    view = c.Frame((0, 0), (10, 10))
+    while True:
+        _, view = yield from c.frame("Frame", view, content_gen=markers)
+        yield
+
+
+def test_grid_index():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        n = rng.integers(1, 500)
+        lo = rng.random((n, 2)) * 100
+        # Mostly small boxes, some spanning many cells, and some degenerate to points
+        size = rng.random((n, 2)) * np.where(rng.random((n, 1)) < 0.1, 50, 2) * (rng.random((n, 1)) > 0.1)
+        bounds = np.concatenate([lo, lo + size], axis=1)
+        index = c.draw._GridIndex(bounds)
+        rects = [rng.random(2) * 120 - 10 for _ in range(30)]
+        rects = [[x, y, x + w, y + h] for (x, y), (w, h) in zip(rects, rng.random((30, 2)) * 40)]
+        # Views at the edges of, covering, and outside of the indexed area
+        extent = [*bounds[:, :2].min(0), *bounds[:, 2:].max(0)]
+        rects += [extent, [extent[0], extent[1], extent[0], extent[1]], [-50, -50, -10, -10],
+                  [extent[2], extent[3], extent[2] + 10, extent[3] + 10], [-1e6, -1e6, 1e6, 1e6]]
+        for rect in rects:
+            expected = np.flatnonzero(c.draw._intersects(bounds, rect))
+            assert np.array_equal(index.query(rect), expected)
+
+
+def test_lod_polyline_samples():
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.random(100001) * 1000)
+    y = rng.normal(size=len(x))
+    spikes = rng.integers(0, len(x), 5)
+    y[spikes] = [50, -50, 30, -40, 60]
+    line = c.draw._LodPolyline(x, y, 'black')
+    for scale, offset, view in [(0.537, 3.3, None), (-0.8, 900, None), (5.1, -20, [100, 0, 300, 1])]:
+        idx = line.samples(np.array([[scale, 0, offset], [0, 1, 0]]), view)
+        assert np.all(np.diff(idx) > 0)
+        assert set(spikes[(x[spikes] >= 100) & (x[spikes] <= 300)] if view else spikes) <= set(idx)
+        # Each pixel column keeps the minimum and the maximum of the full-resolution data
+        col = np.floor(x * scale + offset)
+        kept = np.zeros(len(x), bool)
+        kept[idx] = True
+        visible = np.ones(len(x), bool) if view is None else (x >= view[0]) & (x <= view[2])
+        for i in np.unique(col[visible]):
+            in_col = col == i
+            assert y[in_col].max() == y[in_col & kept].max()
+            assert y[in_col].min() == y[in_col & kept].min()
+    # Fewer samples than pixel columns are drawn as they are
+    assert np.array_equal(line.samples(np.array([[1000, 0, 0], [0, 1, 0]]), [500, 0, 510, 1]),
+                          np.arange(np.searchsorted(x, 500) - 1, np.searchsorted(x, 510, 'right') + 1))
+    short = c.draw._LodPolyline(x[:500], y[:500], 'black')
+    assert np.array_equal(short.samples(np.array([[1000, 0, 0], [0, 1, 0]]), None), np.arange(500))
+
+
+def test_retained_not_shared():
+    pts = np.random.rand(100, 2)
+    a, b = c.draw.Retained(c.draw.scatter, pts, 'white', 'x'), c.draw.Retained(c.draw.scatter, pts, 'white', 'x')
+    assert a._batch is not b._batch
+    assert c.draw._scatter(pts, 'white', 'x') not in (a._batch, b._batch)
+
+
+@c.testing.benchmark_widget
+def test_lod_polyline_perf():
+    x = np.linspace(0, 100, 1000000)
+    signal = c.draw.Retained(c.draw.lod_polyline, x, np.sin(x) + np.sin(x * 1000) * 0.1, 'black')
+    view = c.Frame((0, -2), (100, 2), keep_aspect=False)
+    while True:
+        _, view = yield from c.frame("Frame", view, content_gen=signal)
+        yield
+
+
 @c.testing.test_widget
 def test_scatter(tester):
     def content(tf):
@@ -36,26 +144,86 @@ def test_shapes(tester):
         np.random.seed(0)
         return c.orr([
             # Empty polygonal shapes of all kinds
-            # TODO: enable polygons and polylines tests once these are available upstream
+            # TODO: enable polygon tests once `add_convex_poly_filled` is available upstream
             # c.draw.polygon([], 'white', tf=tf),
             # c.draw.polygon(np.array([]), 'white', tf=tf),
             # c.draw.polygon(np.zeros((0, 2)), 'white', tf=tf),
             # c.draw.polyline([], 'white', tf=tf),
             # c.draw.polyline(np.array([]), 'white', tf=tf),
             # c.draw.polyline(np.zeros((0, 2)), 'white', tf=tf),
-            # c.draw.polygons(np.zeros((0, 123, 2)), 'white', tf=tf),
-            # c.draw.polygons(np.zeros((123, 0, 2)), 'white', tf=tf),
-            # c.draw.polylines([], 'white', tf=tf),
-            # c.draw.polylines(np.zeros((0, 123, 2)), 'white', tf=tf),
-            # c.draw.polylines(np.zeros((123, 0, 2)), 'white', tf=tf),
+            c.draw.polygons(np.zeros((0, 123, 2)), 'white', tf=tf),
+            c.draw.polygons(np.zeros((123, 0, 2)), 'white', tf=tf),
+            c.draw.polylines([], 'white', tf=tf),
+            c.draw.polylines(np.zeros((0, 123, 2)), 'white', tf=tf),
+            c.draw.polylines(np.zeros((123, 0, 2)), 'white', tf=tf),
             c.draw.scatter(np.array([]), 'white', 'x', tf=tf),
             c.draw.scatter(np.zeros([0]), 'white', 'x', tf=tf),
             c.draw.scatter(np.zeros([0,2]), 'white', 'x', tf=tf),
 
             # Normal polygonal shapes
-            # TODO: add triangles tests
+            c.draw.triangles(np.array([[(0.1,0.1), (0.3,0.1), (0.3,0.3)]]), 'white', tf=tf),
+            c.draw.polygons(np.array([[(0.1,0.5), (0.3,0.5), (0.4,0.6), (0.3,0.7), (0.1,0.7)]]), 'white', tf=tf),
+            c.draw.polylines(np.array([[(0.5,0.1), (0.7,0.1), (0.7,0.3)]]), 'white', closed=True, thickness=2, tf=tf),
+            c.draw.rects(np.array([[0.75, 0.75, 0.9, 0.9]]), 'white', tf=tf),
             c.draw.quads(np.array([[(0.5,0.5), (0.7,0.5), (0.7,0.7), (0.5,0.7)]]), 'white', tf=tf),
             # c.draw.polygon(np.array([(0.5,0.5), (0.7,0.5), (0.7,0.7), (0.5,0.7)]), 'white', tf=tf),
             # c.draw.polygon([(0.5,0.5), (0.6,0.5), (0.6,0.6), (0.5,0.6)], 'brown', tf=tf),
             ])
     yield from c.orr([c.image("Image", c.Image(), content_gen=content), tester.pause()])
+
+
+@c.testing.test_widget
+def test_retained(tester):
+    np.random.seed(0)
+    markers = c.draw.Retained(c.draw.scatter, np.random.rand(1000, 2) * 100, 'white', 'x')
+    lines = c.draw.Retained(c.draw.polylines, np.random.rand(100, 5, 2) * 100, 'yellow')
+
+    def content(tf):
+        return c.orr([markers(tf), lines(tf)])
+
+    def actions():
+        # Pan and zoom, so that the retained geometry is both translated and re-triangulated
+        yield from tester.move_cursor(100, 100)
+        yield from tester.mouse_dn(1)
+        yield from tester.move_cursor(150, 120)
+        yield from tester.mouse_up(1)
+        yield from tester.scroll_up()
+        yield from tester.pause()
+
+    im = c.Image(np.zeros((100, 100, 3), 'u1'))
+    script = c.tag("Done", actions())
+    while True:
+        tag, value = yield from c.orr([c.image("Image", im, content_gen=content), script])
+        if tag == "Done":
+            return
+        im = value
+        yield
+
+
+def test_culled_batch_pans_without_triangulation():
+    from types import SimpleNamespace
+    np.random.seed(0)
+    pts = np.random.rand(10000, 2) * 1000
+    calls = []
+
+    def triangulate(shapes, c2s):
+        calls.append(len(shapes))
+        return c.draw._affine(shapes, c2s), np.arange(len(shapes))
+
+    def view(x):
+        return SimpleNamespace(c2s=np.array([[2., 0, -2 * x], [0, 2, 0]]), view_c=[x, 0, x + 100, 100])
+
+    def app(renderer):
+        batch = c.draw._Batch(pts, triangulate, np.concatenate([pts, pts], axis=1), 1, 'white')
+        vtx0, _ = batch.geometry(view(0))
+        assert len(calls) == 1 and calls[0] < len(pts)
+        # Panning inside the culling margin only shifts the vertices, even though other shapes enter the view
+        vtx1, _ = batch.geometry(view(30))
+        assert len(calls) == 1
+        assert np.allclose(vtx1['pos'], vtx0['pos'] - [60, 0])
+        # Panning further re-triangulates the shapes around the new view
+        batch.geometry(view(300))
+        assert len(calls) == 2
+        yield
+
+    c.integrations.null.main(app)
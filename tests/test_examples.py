@@ -49,3 +49,71 @@ def test_polyline(tester):
 def test_widgets(tester):
     import extra.widgets as example
     yield from c.orr([example.app(), tester.pause()])
+
+
+# End-to-end benchmarks of scripted interactions. Run them using
+# pytest tests/test_examples.py -k perf --benchmark-json=bench.json
+
+def pan_zoom_script(tester, x, y):
+    """ Zoom in and out around `x, y`, panning in between. """
+    yield from tester.move_cursor(x, y)
+    for _ in range(5):
+        yield from tester.scroll_up()
+        yield from tester.pause(2)
+    yield from tester.drag(x, y, x - 100, y - 60, button=1, steps=30)
+    yield from tester.drag(x - 100, y - 60, x, y, button=2, steps=30)
+    for _ in range(5):
+        yield from tester.scroll_dn()
+        yield from tester.pause(2)
+
+
+@c.testing.benchmark_scenario
+def test_image_events_perf(tester):
+    import extra.image_events as example
+
+    def script():
+        for i in range(5):
+            yield from tester.drag(100 + i * 40, 100, 150 + i * 40, 300, steps=20)
+        yield from pan_zoom_script(tester, 250, 250)
+    yield from c.orr([example.app(), script()])
+
+
+@c.testing.benchmark_scenario
+def test_plot_image_perf(tester):
+    import extra.plot_image as example
+
+    def script():
+        yield from tester.pause(5)
+        yield from pan_zoom_script(tester, 200, 200)
+    yield from c.orr([example.app(), script()])
+
+
+@c.testing.benchmark_scenario
+def test_animation_perf(tester):
+    import animation as example
+
+    def script():
+        yield from tester.pause(30)
+        yield from pan_zoom_script(tester, 250, 250)
+    yield from c.orr([example.app(), script()])
+
+
+@c.testing.benchmark_scenario
+def test_todo_perf(tester):
+    import todo as example
+
+    def script():
+        yield from tester.pause(2)
+        for i, item in enumerate(["Buy milk", "Write tests", "Profile the app"]):
+            y = 106 + 23 * i  # Each added item moves the input down by one row
+            yield from tester.move_cursor(50, y)
+            yield from tester.click()
+            yield from tester.type_text(item)
+            yield from tester.move_cursor(18, y)
+            yield from tester.click()
+            yield from tester.pause(2)
+        for button_x in [55, 113, 18]:  # Active, Completed, All
+            yield from tester.move_cursor(button_x, 37)
+            yield from tester.click()
+            yield from tester.pause(2)
+    yield from c.orr([example.app(), script()])
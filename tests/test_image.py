@@ -1,6 +1,8 @@
 import concur as c
 from PIL import Image
 import copy
+import os
+import tempfile
 from queue import Queue
 
 import imgui
@@ -154,6 +156,184 @@ def test_npot_textures():
     # assert list(np.unique(column_hot_counts)) == [0, 100, 200, 300, 400]
 
 
+@c.testing.test_widget
+def test_change_image_reuses_texture(tester):
+    im = c.Image(np.zeros((16, 16, 3), 'u1'))
+    tex_ids = {im.tex_id}
+    for i in range(4):
+        im.change_image(np.ones((16, 16, 3), 'u1') * i)
+        tex_ids.add(im.tex_id)
+        yield from c.orr([c.image("", im), tester.pause()])
+        yield
+    # Two textures alternate, so that the texture drawn in the current frame is never overwritten
+    assert len(tex_ids) == 2
+    im.change_image(np.zeros((32, 16, 3), 'u1'))
+    assert im.tex_id not in tex_ids
+
+
+@c.testing.test_widget
+def test_stream_image(tester):
+    from concurrent.futures import ThreadPoolExecutor
+    from OpenGL.GL import glBindTexture, glGetTexImage, GL_TEXTURE_2D, GL_RGB, GL_UNSIGNED_BYTE
+    im = c.Image(np.zeros((16, 16, 3), 'u1'))
+    with ThreadPoolExecutor(1) as executor:
+        for i in range(1, 5):
+            im.stream_image(np.ones((16, 16, 3), 'u1') * i, executor=executor)
+            yield from c.orr([c.image("", im), tester.pause()])
+            yield
+        tex_id = im.tex_id
+        executor.shutdown()
+        # Let the last image through
+        yield from c.orr([c.image("", im), tester.pause()])
+        yield
+    assert im.tex_id == tex_id
+    glBindTexture(GL_TEXTURE_2D, im.tex_id)
+    data = np.frombuffer(glGetTexImage(GL_TEXTURE_2D, 0, GL_RGB, GL_UNSIGNED_BYTE), 'u1')
+    assert np.all(data == 4)
+
+
+@c.testing.test_widget
+def test_image_levels(tester):
+    from OpenGL.GL import glBindTexture, glGetTexImage, GL_TEXTURE_2D, GL_RGBA, GL_UNSIGNED_BYTE
+
+    def displayed(im):
+        glBindTexture(GL_TEXTURE_2D, im.tex_id)
+        data = glGetTexImage(GL_TEXTURE_2D, 0, GL_RGBA, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, 'u1').reshape(16, 16, 4)[..., 0]
+
+    arr = np.repeat(np.linspace(0, 60000, 16).astype('u2')[None], 16, axis=0)
+    im = c.Image(arr, levels=(0, 60000))
+    yield from c.orr([c.image("", im), tester.pause()])
+    assert np.all(np.abs(displayed(im).astype(int) - arr / 60000 * 255) <= 1)
+    raw_tex_id = im.raw_tex_id
+    im.set_levels(20000, 40000)
+    yield from c.orr([c.image("", im), tester.pause()])
+    expected = np.clip((arr.astype(float) - 20000) / 20000, 0, 1) * 255
+    assert np.all(np.abs(displayed(im).astype(int) - expected) <= 1)
+    assert im.raw_tex_id == raw_tex_id
+
+
+def test_texture_data_integers():
+    from concur.integrations.opengl import _texture_data
+    for dtype in ['i2', 'i4', 'u4']:
+        arr = np.array([[0, 300, 70000 if dtype != 'i2' else 30000]], dtype)
+        data, _, _, _ = _texture_data(arr, native=True)
+        # Wider and signed integers don't wrap around modulo 256
+        assert data.dtype == np.float32 and np.all(data[..., 0] == arr)
+
+
+def test_levels_scale():
+    from concur.integrations.opengl import _upload_dtype
+    from concur.extra_widgets.image import _sampled_scale
+    scales = {dtype: _sampled_scale(_upload_dtype(np.dtype(dtype), native=True))
+              for dtype in ['u1', 'u2', 'i2', 'i4', 'u4', 'f8']}
+    # Integers other than 8-bit and 16-bit unsigned are uploaded as floats, so the levels aren't scaled
+    assert scales == dict(u1=255, u2=65535, i2=1, i4=1, u4=1, f8=1)
+
+
+@c.testing.test_widget
+def test_image_levels_int16(tester):
+    from OpenGL.GL import glBindTexture, glGetTexImage, GL_TEXTURE_2D, GL_RGBA, GL_UNSIGNED_BYTE
+    arr = np.repeat(np.linspace(-1000, 1000, 16).astype('i2')[None], 16, axis=0)
+    im = c.Image(arr, levels=(-1000, 1000))
+    yield from c.orr([c.image("", im), tester.pause()])
+    glBindTexture(GL_TEXTURE_2D, im.tex_id)
+    displayed = np.frombuffer(glGetTexImage(GL_TEXTURE_2D, 0, GL_RGBA, GL_UNSIGNED_BYTE), 'u1').reshape(16, 16, 4)
+    assert np.all(np.abs(displayed[..., 0].astype(int) - (arr + 1000) / 2000 * 255) <= 1)
+
+
+@c.testing.test_widget
+def test_image_colormap(tester):
+    from OpenGL.GL import glBindTexture, glGetTexImage, GL_TEXTURE_2D, GL_RGBA, GL_UNSIGNED_BYTE
+
+    def displayed(im):
+        glBindTexture(GL_TEXTURE_2D, im.tex_id)
+        data = glGetTexImage(GL_TEXTURE_2D, 0, GL_RGBA, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, 'u1').reshape(16, 16, 4)
+
+    arr = np.zeros((16, 16), 'f4')
+    arr[:, 8:] = 10
+    im = c.Image(arr, colormap=[(1, 0, 0), (0, 0, 1)])
+    yield from c.orr([c.image("", im), tester.pause()])
+    assert np.all(displayed(im)[:, :8] == [255, 0, 0, 255])
+    assert np.all(displayed(im)[:, 8:] == [0, 0, 255, 255])
+    im.set_colormap("gray")
+    im.set_levels(0, 20)
+    yield from c.orr([c.image("", im), tester.pause()])
+    assert np.all(np.abs(displayed(im)[:, 8:, :3].astype(int) - 128) <= 1)
+
+
+@c.testing.test_widget
+def test_tiled_image(tester):
+    im = c.TiledImage(np.random.randint(0, 255, (3000, 5000, 3), 'u1'), tile_size=256, cache_size=16, max_uploads=2)
+    # Zoomed out, only the coarse tiles are uploaded, at most two per frame
+    for i in range(10):
+        yield from c.orr([c.tiled_image("", im), tester.pause()])
+        yield
+    levels = {key[0] for key in im.cache.tiles}
+    assert len(levels) == 1 and levels.pop() > 0
+    # Zoom in, fine tiles are uploaded, and the cache is bounded
+    yield from tester.move_cursor(100, 100)
+    for i in range(40):
+        event = yield from c.orr([c.tiled_image("", im), tester.scroll_up()])
+        if event is not None:
+            im = event[1]
+        yield
+    for i in range(10):
+        yield from c.orr([c.tiled_image("", im), tester.pause()])
+        yield
+    assert min(key[0] for key in im.cache.tiles) == 0
+    assert len(im.cache.tiles) <= 16
+
+
+def test_tiled_image_copy():
+    im = c.TiledImage(np.zeros((3000, 5000, 3), 'u1'), tile_size=256)
+    im2 = copy.deepcopy(im)
+    assert im2.source is im.source and im2.cache is im.cache
+    assert im2.pan_zoom is not im.pan_zoom
+    im2.pan_zoom.left = 10
+    assert im.pan_zoom.left == 0
+
+
+def test_tiled_image_box_filter():
+    # Stripes one pixel wide would be aliased to a single color by strided sampling
+    arr = np.zeros((300, 500), 'u1')
+    arr[:, 1::2] = 200
+    im = c.TiledImage(arr, tile_size=64)
+    assert np.all(im._tile_data((0, 1, 2)) == arr[64:128, 128:192])
+    assert np.all(im._tile_data((1, 1, 2)) == 100)
+    # Up to 4x4 samples are averaged, including the smaller blocks at the image edges
+    arr = np.random.randint(0, 255, (300, 500, 3), 'u1')
+    im = c.TiledImage(arr, tile_size=64)
+    for key, sub in [((2, 1, 1), 1), ((3, 0, 0), 2), ((4, 0, 0), 4)]:
+        x, y, w, h = im.tile_rect(key)
+        samples = arr[y:y + h:sub, x:x + w:sub].astype(float)
+        expected = [[samples[i:i + 4, j:j + 4].mean((0, 1)) for j in range(0, samples.shape[1], 4)]
+                    for i in range(0, samples.shape[0], 4)]
+        assert np.all(im._tile_data(key) == np.rint(expected))
+
+
+@c.testing.test_widget
+def test_tiled_image_pan_shares_source(tester):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "image.raw")
+        np.zeros((3000, 5000, 3), 'u1').tofile(path)
+        source = c.raw_source(path, (3000, 5000, 3))
+        im = c.TiledImage(source, tile_size=256)
+        script = c.tag("Done", tester.drag(200, 200, 100, 150, button=1))
+        events = 0
+        while True:
+            tag, value = yield from c.orr([c.tiled_image("Image", im), script])
+            if tag == "Done":
+                break
+            im = value
+            events += 1
+            yield
+        assert events > 0
+        assert im.source is source
+        del source, im
+
+
 def _test_events_generic(tester, state, widget):
     # Event-less
     yield from c.orr([
@@ -0,0 +1,89 @@
+import concur as c
+import copy
+from PIL import Image, TiffImagePlugin, TiffTags
+
+import numpy as np
+
+
+def test_raw_source(tmp_path):
+    arr = np.random.randint(0, 255, (30, 50, 3), 'u1')
+    path = tmp_path / "image.raw"
+    path.write_bytes(b"header" + arr.tobytes())
+    source = c.raw_source(path, arr.shape, offset=6)
+    assert np.all(source[5:20:2, 7:40:2] == arr[5:20:2, 7:40:2])
+
+
+def test_pil_source(tmp_path):
+    arr = np.random.randint(0, 255, (30, 50, 3), 'u1')
+    for ext, memmapped in [("tif", True), ("png", False), ("bmp", False)]:
+        path = tmp_path / f"image.{ext}"
+        Image.fromarray(arr).save(path)
+        source = c.PILSource(path)
+        assert (source.mmap is not None) == memmapped
+        assert source.shape == arr.shape
+        assert np.all(source[5:20:2, 7:40:2] == arr[5:20:2, 7:40:2])
+        assert np.all(np.array(source) == arr)
+
+
+def _save_tiled_tiff(path, arr, tile):
+    """ Pillow doesn't write tiled TIFF files, so write an uncompressed one by hand. """
+    h, w = arr.shape[:2]
+    padded = np.zeros((-(-h // tile) * tile, -(-w // tile) * tile) + arr.shape[2:], arr.dtype)
+    padded[:h, :w] = arr
+    tiles = [padded[y:y + tile, x:x + tile].tobytes() for y in range(0, h, tile) for x in range(0, w, tile)]
+    ifd = TiffImagePlugin.ImageFileDirectory_v2()
+    ifd[256], ifd[257], ifd[258], ifd[259], ifd[262], ifd[277] = w, h, (8, 8, 8), 1, 2, 3
+    ifd[322], ifd[323] = tile, tile
+    ifd.tagtype[324] = ifd.tagtype[325] = TiffTags.LONG
+    ifd[324], ifd[325] = (0,) * len(tiles), tuple(len(t) for t in tiles)
+    start = 8 + len(ifd.tobytes(8))
+    ifd[324] = tuple(start + i * len(tiles[0]) for i in range(len(tiles)))
+    with open(path, 'wb') as f:
+        f.write(b'II*\x00' + (8).to_bytes(4, 'little') + ifd.tobytes(8) + b''.join(tiles))
+
+
+def test_pil_source_strips_and_tiles(tmp_path, monkeypatch):
+    arr = np.random.randint(0, 255, (100, 150, 3), 'u1')
+    monkeypatch.setattr(TiffImagePlugin, 'WRITE_LIBTIFF', True)
+    Image.fromarray(arr).save(tmp_path / "strips.tif", strip_size=5000)
+    _save_tiled_tiff(tmp_path / "tiles.tif", arr, 32)
+    for name in ["strips.tif", "tiles.tif"]:
+        with Image.open(tmp_path / name) as im:
+            assert len(im.tile) > 1
+        source = c.PILSource(tmp_path / name)
+        assert source.mmap is not None and not source.decoded
+        for step in [1, 2, 3, 7, 40]:
+            assert np.all(source[5:90:step, 7:149:step] == arr[5:90:step, 7:149:step])
+        assert np.all(np.array(source) == arr)
+        assert not source.decoded
+
+
+def test_pil_source_16bit(tmp_path):
+    arr = np.random.randint(0, 65535, (30, 50), 'u2')
+    path = tmp_path / "image.tif"
+    Image.fromarray(arr).save(path)
+    source = c.PILSource(path)
+    assert source.dtype == np.uint16
+    assert np.all(source[::3, ::3] == arr[::3, ::3])
+
+
+def test_pil_source_jpeg_draft(tmp_path):
+    arr = np.zeros((64, 96, 3), 'u1')
+    arr[:, 48:] = 255
+    path = tmp_path / "image.jpg"
+    Image.fromarray(arr).save(path)
+    source = c.PILSource(path)
+    # Downsampled reads decode the JPEG at a reduced resolution
+    coarse = source[::4, ::4]
+    assert 1 not in source.decoded
+    assert coarse.shape == (16, 24, 3)
+    assert np.abs(coarse.astype(int) - arr[::4, ::4]).max() < 16
+
+
+def test_sources_are_not_copied(tmp_path):
+    arr = np.random.randint(0, 255, (30, 50, 3), 'u1')
+    (tmp_path / "image.raw").write_bytes(arr.tobytes())
+    Image.fromarray(arr).save(tmp_path / "image.tif")
+    for source in [c.raw_source(tmp_path / "image.raw", arr.shape), c.PILSource(tmp_path / "image.tif")]:
+        assert copy.deepcopy(source) is source
+        assert np.all(source[::2, ::2] == arr[::2, ::2])
@@ -0,0 +1,39 @@
+import concur as c
+import imgui
+
+
+def test_null_main():
+    frames = []
+
+    def app(renderer):
+        for i in range(10):
+            frames.append(imgui.get_time())
+            yield from c.orr([c.button("Button"), c.event(None)])
+            yield
+
+    draw_data = c.integrations.null.main(app, 320, 240, capture_draw_data=True)
+    assert len(frames) == 10
+    assert abs(frames[-1] - frames[0] - 9 / 60) < 1e-6
+    vtx, idx, commands = draw_data[0]
+    assert len(vtx) > 0 and len(idx) == sum(n for _, _, n in commands)
+
+
+def test_null_max_frames():
+    def app(renderer):
+        while True:
+            yield
+    assert c.integrations.null.main(app, max_frames=5) is None
+
+
+def test_null_input():
+    def app(renderer):
+        tester = c.testing.Testing(renderer)
+        return c.testing.window(c.orr([tester.click_next(), c.button("Button")]))
+
+    clicks = []
+
+    def run(renderer):
+        clicks.append((yield from app(renderer)))
+
+    c.integrations.null.main(run, max_frames=100)
+    assert clicks == [("Button", None)]
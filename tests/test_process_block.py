@@ -0,0 +1,60 @@
+import concur as c
+from concurrent.futures import ProcessPoolExecutor
+import gc
+import sys
+import time
+
+import numpy as np
+import pytest
+
+
+def compute(n):
+    return np.arange(n, dtype='f8'), {"sum": n * (n - 1) // 2, "small": np.ones(3)}
+
+
+def spin(cancelled):
+    t0 = time.perf_counter()
+    while not cancelled():
+        if time.perf_counter() - t0 > 10:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def run(widget):
+    while True:
+        try:
+            next(widget)
+        except StopIteration as e:
+            return e.value
+        time.sleep(0.001)
+
+
+def test_process_block():
+    with ProcessPoolExecutor(1) as executor:
+        arr, info = run(c.ProcessBlock(executor, compute, 1_000_000))
+    assert np.all(arr == np.arange(1_000_000))
+    assert info["sum"] == 499999500000
+    assert np.all(info["small"] == 1)
+
+
+def test_process_block_cancel():
+    with ProcessPoolExecutor(1) as executor:
+        widget = c.ProcessBlock(executor, spin, cancellable=True)
+        time.sleep(0.2)
+        future = widget.future
+        del widget
+        assert future.result(timeout=5) is True
+
+
+def test_process_block_failed_submit(monkeypatch):
+    class ClosedExecutor(object):
+        def submit(self, *args, **kwargs):
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+    unraisable = []
+    monkeypatch.setattr(sys, "unraisablehook", unraisable.append)
+    with pytest.raises(RuntimeError):
+        c.ProcessBlock(ClosedExecutor(), compute, 10, cancellable=True)
+    gc.collect()
+    assert unraisable == []
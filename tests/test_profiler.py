@@ -0,0 +1,48 @@
+import concur as c
+import json
+import numpy as np
+
+
+def test_profiler():
+    @c.testing.test_widget
+    def app(tester):
+        for i in range(6):
+            yield from c.orr([c.child("Child", c.button("Button"), 100, 100), tester.pause()])
+            yield
+
+    profiler = c.profiler.start(sample_every=2)
+    try:
+        app()
+    finally:
+        assert c.profiler.stop() is profiler
+    assert 0 < len(profiler.frames) < profiler.frame_index
+    rows = {path: (calls, total, own) for path, calls, total, own in profiler.table()}
+    child_path = next(path for path in rows if path.endswith("/0/Child"))
+    # The child is drawn at most once per frame, but not in the frames between the iterations
+    assert 0 < rows[child_path][0] <= 1
+    parent_path = child_path.rpartition("/")[0]
+    assert rows[parent_path][1] >= rows[child_path][1]
+    assert rows[parent_path][2] <= rows[parent_path][1]
+    trace = json.loads(json.dumps(profiler.chrome_trace()))
+    assert {event["name"] for event in trace["traceEvents"]} >= {"frame", "Child"}
+
+
+def test_draw_stats():
+    counts = []
+
+    def app(renderer):
+        for n in [0, 10, 100]:
+            c.profiler.count_gl(texture_binds=1, texture_uploads=1)
+            yield from c.orr([c.draw.scatter(np.zeros((n, 2)), 'white', 'x', 5), c.event(None)])
+            yield
+            counts.append(c.profiler.draw_stats())
+
+    draw_data = c.integrations.null.main(lambda renderer: c.testing.window(app(renderer)), capture_draw_data=True)
+    assert [stats["texture_uploads"] for stats in counts] == [1, 1, 1]
+    assert counts[0]["vertices"] < counts[1]["vertices"] < counts[2]["vertices"]
+    # Draw data and the counters of the last frame
+    last = c.profiler.draw_stats()
+    assert last["cmd_lists"] == len(draw_data)
+    assert last["vertices"] == sum(len(vtx) for vtx, _, _ in draw_data)
+    assert last["indices"] == sum(len(idx) for _, idx, _ in draw_data)
+    assert last["draw_cmds"] == sum(len(commands) for _, _, commands in draw_data)
@@ -23,6 +23,44 @@ def test_collapsing_header(tester):
     assert res == ("Button", None)
 
 
+@c.testing.test_widget
+def test_tree_node_lazy(tester):
+    created = []
+
+    def content():
+        created.append(None)
+        return tester.mark("B", c.button("Button"))
+
+    def ctrl():
+        yield
+        assert created == []
+        yield from tester.click_marked("H")
+        yield from tester.click_marked("B")
+    res = yield from c.orr([
+        tester.mark("H", c.tree_node("Node", content, open=False, release=True)),
+        ctrl(),
+        ])
+    assert res == ("Button", None)
+    assert len(created) == 1
+
+
+@c.testing.test_widget
+def test_virtual_list(tester):
+    created = []
+
+    def row(i):
+        created.append(i)
+        return tester.mark(f"Row {i}", c.button(f"Row {i}"))
+
+    res = yield from c.orr([
+        c.virtual_list("List", 1000000, row, height=200),
+        tester.click_marked("Row 3"),
+        ])
+    assert res == ("Row 3", None)
+    assert max(created) < 20
+    assert len(created) == len(set(created))
+
+
 @c.testing.test_widget
 def test_button(tester):
     res = yield from c.orr([